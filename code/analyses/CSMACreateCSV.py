@@ -1,89 +1,113 @@
 import os
-import re
 import csv
+import argparse
 from collections import defaultdict
 import pandas as pd
+from summarycache import SummaryCache
+from logparser import iter_events, is_log_file, SentMessages, SEND, RECV, SINK_NODE
 
 # === Configuration ===
-log_dir = "code/analyses/logfiles"  # Directory with CSMA_*.testlog files
+log_dir = "code/analyses/logfiles"  # Directory with CSMA_*.testlog[.gz|.zst] files
 output_csv = "code/analyses/csma_summary_means.csv"
+ANALYSER_VERSION = 1  # bump when the summary below changes
 
-# === Initialize list for summary rows
-summary_records = []
 
-# === List all CSMA log files
-log_files = [f for f in os.listdir(log_dir) if f.startswith("CSMA_") and f.endswith(".testlog")]
+# === Per-file summary ===
+class MeanSummary:
+    """The per-file MEAN summary, built one event at a time.
 
-# === Process each file
-for filename in log_files:
-    filepath = os.path.join(log_dir, filename)
+    summarise_log() feeds it a whole log; the Cooja runners feed it the
+    events of a log while the simulation is still writing it.
+    """
+    KINDS = (SEND, RECV)
 
-    sent_messages = {}
-    sender_delays = defaultdict(list)
-    sent_counts = defaultdict(int)
-    recv_counts = defaultdict(int)
-    recv_bytes = defaultdict(int)
-    first_send_time = defaultdict(lambda: float('inf'))
-    last_recv_time = defaultdict(lambda: 0)
+    def __init__(self):
+        self.sent_messages = SentMessages()
+        self.sender_delays = defaultdict(list)
+        self.sent_counts = defaultdict(int)
+        self.recv_counts = defaultdict(int)
+        self.recv_bytes = defaultdict(int)
+        self.first_send_time = defaultdict(lambda: float('inf'))
+        self.last_recv_time = defaultdict(lambda: 0)
 
-    with open(filepath, 'r') as file:
-        lines = file.readlines()
-
-    for line in lines:
+    def feed(self, event):
         # Sent line
-        send_match = re.match(r'^(\d+)\s+(\d+)\s+Sending message: \'(.+?)\' to fd00::210:10:10:10', line)
-        if send_match:
-            tick = int(send_match.group(1))
-            node = send_match.group(2)
-            msg = send_match.group(3).strip()
-            sent_messages[msg] = (tick, node)
-            sent_counts[node] += 1
-            first_send_time[node] = min(first_send_time[node], tick)
+        if event.kind == SEND:
+            tick = event.tick
+            node = event.node
+            self.sent_messages.add(event)
+            self.sent_counts[node] += 1
+            self.first_send_time[node] = min(self.first_send_time[node], tick)
 
         # Received line
-        recv_match = re.match(r'^(\d+)\s+16\s+Data received from .*? in \d+ hops with datalength \d+: \'(.+?)\'', line)
-        if recv_match:
-            tick = int(recv_match.group(1))
-            msg = recv_match.group(2).strip()
-            if msg in sent_messages:
-                send_tick, node = sent_messages[msg]
+        elif event.kind == RECV and event.node == SINK_NODE and event.value is not None:
+            tick = event.tick
+            sent = self.sent_messages.lookup(event)
+            if sent:
+                send_tick, node = sent
                 delay = tick - send_tick
-                sender_delays[node].append(delay)
-                recv_counts[node] += 1
-                recv_bytes[node] += len(msg)
-                last_recv_time[node] = max(last_recv_time[node], tick)
-
-    # === Compute per-file means ===
-    total_sent = total_recv = total_delay = total_throughput = 0
-    num_senders = 0
-
-    for node in sent_counts:
-        sent = sent_counts[node]
-        received = recv_counts[node]
-        if received > 0:
-            delay = sum(sender_delays[node]) / (received*1000)
-            timespan = (last_recv_time[node] - first_send_time[node]) / 1000  # ms → sec
-            throughput = (recv_bytes[node] / (timespan / 1000)) if timespan > 0 else 0
-
-            total_sent += sent
-            total_recv += received
-            total_delay += delay
-            total_throughput += throughput
-            num_senders += 1
-
-    if num_senders > 0 and total_sent > 0:
-        summary_records.append({
-            "File": filename,
-            "End-to-End latency(ms)": round(total_delay / num_senders, 2),
-            "Sent": total_sent // num_senders,
-            "Received": total_recv // num_senders,
-            "Throughput %": round((total_recv / total_sent) * 100, 2),
-            "Sendrate (Bps)": round(total_throughput / num_senders, 2)
-        })
-
-# === Write to CSV
-os.makedirs(os.path.dirname(output_csv), exist_ok=True)
-df = pd.DataFrame(summary_records)
-df.to_csv(output_csv, index=False)
-
-print(f"✅ Summary saved to: {output_csv}")
+                self.sender_delays[node].append(delay)
+                self.recv_counts[node] += 1
+                self.recv_bytes[node] += event.length
+                self.last_recv_time[node] = max(self.last_recv_time[node], tick)
+
+    def row(self, filename):
+        """The CSV row of the events fed so far, or None if nothing was received."""
+        total_sent = total_recv = total_delay = total_throughput = 0
+        num_senders = 0
+
+        for node in self.sent_counts:
+            sent = self.sent_counts[node]
+            received = self.recv_counts[node]
+            if received > 0:
+                delay = sum(self.sender_delays[node]) / (received*1000)
+                timespan = (self.last_recv_time[node] - self.first_send_time[node]) / 1000  # ms → sec
+                throughput = (self.recv_bytes[node] / (timespan / 1000)) if timespan > 0 else 0
+
+                total_sent += sent
+                total_recv += received
+                total_delay += delay
+                total_throughput += throughput
+                num_senders += 1
+
+        if num_senders > 0 and total_sent > 0:
+            return {
+                "File": filename,
+                "End-to-End latency(ms)": round(total_delay / num_senders, 2),
+                "Sent": total_sent // num_senders,
+                "Received": total_recv // num_senders,
+                "Throughput %": round((total_recv / total_sent) * 100, 2),
+                "Sendrate (Bps)": round(total_throughput / num_senders, 2)
+            }
+        return None
+
+
+def summarise_log(file_path):
+    summary = MeanSummary()
+    for event in iter_events(file_path, kinds=MeanSummary.KINDS):
+        summary.feed(event)
+    return summary.row(os.path.basename(file_path))
+
+
+# === Main ===
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write the per-file CSMA MEAN summary of all logs in logfiles/.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes that parse logs (default: 1)")
+    args = parser.parse_args()
+
+    cache = SummaryCache(os.path.join(log_dir, "summary_cache.json"), "CSMACreateCSV", ANALYSER_VERSION)
+
+    # === List all CSMA log files, sorted so the CSV is the same for any --jobs
+    log_files = [os.path.join(log_dir, f) for f in sorted(os.listdir(log_dir))
+                 if f.startswith("CSMA_") and is_log_file(f)]
+
+    # === Process each file
+    summary_records = [row for row in cache.lookup_all(log_files, summarise_log, jobs=args.jobs) if row]
+    cache.save()
+
+    # === Write to CSV
+    os.makedirs(os.path.dirname(output_csv), exist_ok=True)
+    df = pd.DataFrame(summary_records)
+    df.to_csv(output_csv, index=False)
+
+    print(f"✅ Summary saved to: {output_csv}")
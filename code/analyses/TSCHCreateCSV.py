@@ -1,87 +1,76 @@
 import os
-import re
 import csv
+import argparse
 from collections import defaultdict
+from summarycache import SummaryCache
+from logparser import iter_events, is_log_file, PendingSends, SentMessages, SEND, RECV, TSCH_SEND, SENDER_NODES, SINK_NODE
 
 # === Configuration ===
 log_dir = "code/analyses/logfiles"
 output_csv = "code/analyses/tsch_summary_means.csv"
-sender_nodes = [str(n) for n in [10, 11, 19, 2, 20, 21, 22, 23, 24, 25, 26, 27, 28, 3, 4, 5, 6, 7, 8, 9]]
+sender_nodes = SENDER_NODES
+ANALYSER_VERSION = 1  # bump when the summary below changes
 
-# === Prepare CSV output ===
-with open(output_csv, mode='w', newline='') as csvfile:
-    fieldnames = [
-        "File", "End-to-End latency(ms)", "Sent",
-        "Confirmed", "Received", "Throughput %", "Sendrate (Bps)"
-    ]
-    writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-    writer.writeheader()
-
-    # === Loop over files ===
-    for filename in sorted(os.listdir(log_dir)):
-        if not filename.startswith("TSCH_") or not filename.endswith(".testlog"):
-            continue
-
-        file_path = os.path.join(log_dir, filename)
-
-        # Reset stats
-        sent_messages = {}
-        sender_delays = defaultdict(list)
-        sent_counts = defaultdict(int)
-        confirmed_sent_counts = defaultdict(int)
-        recv_counts = defaultdict(int)
-        recv_bytes = defaultdict(int)
-        first_send_time = defaultdict(lambda: float('inf'))
-        last_recv_time = defaultdict(lambda: 0)
-
-        try:
-            with open(file_path, 'r') as file:
-                lines = list(file)
-        except:
-            continue
-
-        for i, line in enumerate(lines):
-            send_match = re.match(r'^(\d+)\s+(\d+)\s+Sending message: \'(.+?)\' to fd00::210:10:10:10', line)
-            if send_match:
-                time = int(send_match.group(1))
-                sender_node = send_match.group(2)
-                message = send_match.group(3).strip()
+
+# === Per-file summary ===
+class MeanSummary:
+    """The per-file MEAN summary, built one event at a time.
+
+    summarise_log() feeds it a whole log; the Cooja runners feed it the
+    events of a log while the simulation is still writing it.
+    """
+    KINDS = (SEND, TSCH_SEND, RECV)
+
+    def __init__(self):
+        self.sent_messages = SentMessages()
+        self.sender_delays = defaultdict(list)
+        self.sent_counts = defaultdict(int)
+        self.confirmed_sent_counts = defaultdict(int)
+        self.pending_sends = PendingSends()
+        self.recv_counts = defaultdict(int)
+        self.recv_bytes = defaultdict(int)
+        self.first_send_time = defaultdict(lambda: float('inf'))
+        self.last_recv_time = defaultdict(lambda: 0)
+
+    def feed(self, event):
+        if event.kind == SEND:
+            time = event.tick
+            sender_node = event.node
+            if sender_node in sender_nodes:
+                self.sent_counts[sender_node] += 1
+                self.sent_messages.add(event)
+                self.first_send_time[sender_node] = min(self.first_send_time[sender_node], time)
+                self.pending_sends.add(event)
+
+        elif event.kind == TSCH_SEND:
+            self.confirmed_sent_counts[event.node] += self.pending_sends.confirm(event)
+
+        elif event.kind == RECV and event.node == SINK_NODE and event.value is not None:
+            time = event.tick
+            sent = self.sent_messages.lookup(event)
+            if sent:
+                send_time, sender_node = sent
                 if sender_node in sender_nodes:
-                    sent_counts[sender_node] += 1
-                    sent_messages[message] = (time, sender_node)
-                    first_send_time[sender_node] = min(first_send_time[sender_node], time)
-                    for followup in lines[i+1:i+11]:
-                        tsch_match = re.match(r'^\d+\s+' + sender_node + r'\s+\[INFO: TSCH\s+\] send packet to .*', followup)
-                        if tsch_match:
-                            confirmed_sent_counts[sender_node] += 1
-                            break
-
-            recv_match = re.match(r'^(\d+)\s+16\s+Data received from .*? in \d+ hops with datalength \d+: \'(.+?)\'', line)
-            if recv_match:
-                time = int(recv_match.group(1))
-                message = recv_match.group(2).strip()
-                if message in sent_messages:
-                    send_time, sender_node = sent_messages[message]
-                    if sender_node in sender_nodes:
-                        delay = time - send_time
-                        sender_delays[sender_node].append(delay)
-                        recv_counts[sender_node] += 1
-                        recv_bytes[sender_node] += len(message)
-                        last_recv_time[sender_node] = max(last_recv_time[sender_node], time)
-
-        # === Aggregate results for the file ===
+                    delay = time - send_time
+                    self.sender_delays[sender_node].append(delay)
+                    self.recv_counts[sender_node] += 1
+                    self.recv_bytes[sender_node] += event.length
+                    self.last_recv_time[sender_node] = max(self.last_recv_time[sender_node], time)
+
+    def row(self, filename):
+        """The CSV row of the events fed so far, or None if no sender got a message through."""
         total_sent = total_confirmed = total_received = total_delay = total_throughput = 0
         num_senders = 0
 
         for sender in sender_nodes:
-            sent = sent_counts[sender]
-            confirmed = confirmed_sent_counts[sender]
-            received = recv_counts[sender]
+            sent = self.sent_counts[sender]
+            confirmed = self.confirmed_sent_counts[sender]
+            received = self.recv_counts[sender]
 
             if confirmed > 0 and received > 0:
-                avg_delay = sum(sender_delays[sender]) / (received * 1000)
-                time_span = (last_recv_time[sender] - first_send_time[sender]) / 1000
-                throughput = (recv_bytes[sender] / (time_span / 1000)) if time_span > 0 else 0
+                avg_delay = sum(self.sender_delays[sender]) / (received * 1000)
+                time_span = (self.last_recv_time[sender] - self.first_send_time[sender]) / 1000
+                throughput = (self.recv_bytes[sender] / (time_span / 1000)) if time_span > 0 else 0
 
                 total_sent += sent
                 total_confirmed += confirmed
@@ -91,7 +80,7 @@ with open(output_csv, mode='w', newline='') as csvfile:
                 num_senders += 1
 
         if num_senders > 0 and total_confirmed > 0:
-            writer.writerow({
+            return {
                 "File": filename,
                 "End-to-End latency(ms)": round(total_delay / num_senders, 2),
                 "Sent": total_sent // num_senders,
@@ -99,6 +88,44 @@ with open(output_csv, mode='w', newline='') as csvfile:
                 "Received": total_received // num_senders,
                 "Throughput %": round((total_received / total_confirmed) * 100, 2),
                 "Sendrate (Bps)": round(total_throughput / num_senders, 2)
-            })
+            }
+        return None
+
+
+def summarise_log(file_path):
+    summary = MeanSummary()
+    for event in iter_events(file_path, kinds=MeanSummary.KINDS):
+        summary.feed(event)
+    return summary.row(os.path.basename(file_path))
+
+
+# === Main ===
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write the per-file TSCH MEAN summary of all logs in logfiles/.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes that parse logs (default: 1)")
+    args = parser.parse_args()
+
+    cache = SummaryCache(os.path.join(log_dir, "summary_cache.json"), "TSCHCreateCSV", ANALYSER_VERSION)
+
+    # Sorted by file name, so the CSV is the same for any --jobs
+    log_files = [
+        os.path.join(log_dir, filename) for filename in sorted(os.listdir(log_dir))
+        if filename.startswith("TSCH_") and is_log_file(filename)
+        and os.access(os.path.join(log_dir, filename), os.R_OK)
+    ]
+    rows = cache.lookup_all(log_files, summarise_log, jobs=args.jobs)
+    cache.save()
+
+    # === Prepare CSV output ===
+    with open(output_csv, mode='w', newline='') as csvfile:
+        fieldnames = [
+            "File", "End-to-End latency(ms)", "Sent",
+            "Confirmed", "Received", "Throughput %", "Sendrate (Bps)"
+        ]
+        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in rows:
+            if row:
+                writer.writerow(row)
 
-print(f"\n✅ Per-file MEAN summary written to: {output_csv}")
+    print(f"\n✅ Per-file MEAN summary written to: {output_csv}")
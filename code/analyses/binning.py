@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+
+# === Vectorised time binning ===
+# The dashboards aggregate event columns (eventcache.load_table) per time
+# bin instead of appending every sample to a defaultdict(list). A bin is
+# tick // width, so any width (10 s, 30 s, 5 min) is computed from the same
+# cached table without reparsing the log. Every helper returns a pandas
+# Series indexed by bin number that holds only the bins with samples, like
+# the dicts it replaces; bin_frame() lines them up into one table.
+
+TICKS_PER_SECOND = 1_000_000
+
+
+def bin_index(ticks, width):
+    """Bin number of each tick for a bin width in seconds."""
+    return ticks // int(width * TICKS_PER_SECOND)
+
+
+def bin_count(bins, weights=None):
+    """Samples per bin, or the sum of their weights (added in sample order)."""
+    counts = np.bincount(bins)
+    present = np.flatnonzero(counts)
+    if weights is None:
+        return pd.Series(counts[present], index=present)
+    return pd.Series(np.bincount(bins, weights=weights)[present], index=present)
+
+
+def bin_mean(bins, values):
+    return bin_count(bins, values) / bin_count(bins)
+
+
+def bin_max(bins, values):
+    if len(bins) == 0:
+        return pd.Series(dtype=values.dtype)
+    order = np.argsort(bins, kind='stable')
+    bins, values = bins[order], values[order]
+    starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])
+    return pd.Series(np.maximum.reduceat(values, starts), index=bins[starts])
+
+
+def bin_frame(columns):
+    """Align per-bin Series on the union of their bins; missing bins are 0."""
+    df = pd.DataFrame(columns).sort_index()
+    for name, series in columns.items():
+        df[name] = df[name].fillna(0).astype(series.dtype if len(series) else float)
+    return df
+
+
+def bin_start(bins, width, unit=60):
+    """Start of each bin in `unit` seconds (minutes by default); whole numbers stay ints."""
+    bins = np.asarray(bins)
+    if width % unit == 0:
+        return bins * (width // unit)
+    return bins * width / unit
@@ -1,9 +1,10 @@
-import re
 from collections import defaultdict
 import os
+from logparser import (iter_events, set_log_window, SentMessages, MODULE_KINDS, SEND, RECV, TSCH_SEND,
+                       QUEUE_FULL, ALL_SENT, SENDER_NODES, SINK_NODE)
 
 # Verzonden berichten: message => (timestamp, sender_node)
-sent_messages = {}
+sent_messages = SentMessages()
 
 # Verzameldata per sender
 sender_delays = defaultdict(list)
@@ -29,74 +30,60 @@ trimmed_output = False
 first_send_done_time = {}
 
 # Enkel deze nodes analyseren
-sender_nodes = [10, 11, 19, 2, 20, 21, 22, 23, 24, 25, 26, 27, 28, 3, 4, 5, 6, 7, 8, 9]
-sender_nodes = [str(n) for n in sender_nodes]
-
-with open(input_path, 'r') as file:
-    for line in file:
-        # Tel lijnen per node
-        line_node_match = re.match(r'^\d+\s+(\d+)\s+\[.*?\]', line)
-        if line_node_match:
-            node = line_node_match.group(1)
-            if node in sender_nodes:
-                line_counts[node] += 1
-
-        # TSCH send line (additional counter)
-        tsch_send_match = re.match(r'^\d+\s+(\d+)\s+\[INFO: TSCH\s+\] send packet to .*', line)
-        if tsch_send_match:
-            node = tsch_send_match.group(1)
-            if node in sender_nodes:
-                tsch_send_counts[node] += 1
-
-        # Verstuurd bericht detecteren
-        send_match = re.match(r'^(\d+)\s+(\d+)\s+Sending message: \'(.+)\' to fd00::210:10:10:10', line)
-        if send_match:
-            time = int(send_match.group(1))
-            sender_node = send_match.group(2)
-            message = send_match.group(3).strip()
+sender_nodes = SENDER_NODES
+
+for event in iter_events(input_path):
+    if event.tick is None:
+        continue
+    node = event.node
+
+    # Tel lijnen per node
+    if event.kind in MODULE_KINDS and node in sender_nodes:
+        line_counts[node] += 1
+
+    # TSCH send line (additional counter)
+    if event.kind == TSCH_SEND:
+        if node in sender_nodes:
+            tsch_send_counts[node] += 1
+
+    # Verstuurd bericht detecteren
+    elif event.kind == SEND:
+        time = event.tick
+        sender_node = node
+        if sender_node in sender_nodes:
+            sent_messages.add(event)
+            sent_counts[sender_node] += 1
+            first_send_time[sender_node] = min(first_send_time[sender_node], time)
+
+    # Ontvangen bericht detecteren
+    elif event.kind == RECV and node == SINK_NODE and event.value is not None:
+        time = event.tick
+        hops = event.value
+        sent = sent_messages.lookup(event)
+        if sent:
+            send_time, sender_node = sent
             if sender_node in sender_nodes:
-                sent_messages[message] = (time, sender_node)
-                sent_counts[sender_node] += 1
-                first_send_time[sender_node] = min(first_send_time[sender_node], time)
-
-        # Ontvangen bericht detecteren
-        recv_match = re.match(
-            r'^(\d+)\s+16\s+Data received from .*? in (\d+) hops with datalength \d+: \'(.+)\'', line)
-        if recv_match:
-            time = int(recv_match.group(1))
-            hops = int(recv_match.group(2))
-            message = recv_match.group(3).strip()
-            if message in sent_messages:
-                send_time, sender_node = sent_messages[message]
-                if sender_node in sender_nodes:
-                    delay = time - send_time
-                    sender_delays[sender_node].append(delay)
-                    sender_hops[sender_node].append(hops)
-                    recv_counts[sender_node] += 1
-                    recv_bytes[sender_node] += len(message)
-                    last_recv_time[sender_node] = max(last_recv_time[sender_node], time)
-
-        # All messages send
-        send_done_match = re.match(r'^(\d+)\s+(\d+)\s+All messages send:', line)
-        if send_done_match:
-            time = int(send_done_match.group(1))
-            node = send_done_match.group(2)
-            if node in sender_nodes and node not in first_send_done_time:
-                first_send_done_time[node] = time
-            last_association_time = max(last_association_time, time)
-
-        # Laatste timestamp
-        matchTimestamp = re.match(r'^(\d+)\s+', line)
-        if matchTimestamp:
-            timestamp = int(matchTimestamp.group(1))
-            last_timestamp = max(last_timestamp, timestamp)
-
-        # Queue full errors
-        queue_match = re.match(r'^\d+\s+(\d+)\s+\[.*?\] ! can\'t send packet .* queue \d+/\d+ \d+/\d+', line)
-        if queue_match:
-            node = queue_match.group(1)
-            if node in sender_nodes:
-                queue_full_counts[node] += 1
+                delay = time - send_time
+                sender_delays[sender_node].append(delay)
+                sender_hops[sender_node].append(hops)
+                recv_counts[sender_node] += 1
+                recv_bytes[sender_node] += event.length
+                last_recv_time[sender_node] = max(last_recv_time[sender_node], time)
+
+    # All messages send
+    elif event.kind == ALL_SENT:
+        time = event.tick
+        if node in sender_nodes and node not in first_send_done_time:
+            first_send_done_time[node] = time
+        last_association_time = max(last_association_time, time)
+
+    # Queue full errors
+    elif event.kind == QUEUE_FULL:
+        if node in sender_nodes:
+            queue_full_counts[node] += 1
+
+    # Laatste timestamp
+    last_timestamp = max(last_timestamp, event.tick)
 
 print("\n'queue full' ERRORS per node:")
 for node in sorted(queue_full_counts.keys(), key=int):
@@ -114,18 +101,8 @@ print(f"\nLast 'All messages send:' line: Node {last_node} on {last_time} ticks"
 print(f"Last line in file: {last_timestamp} ticks")
 
 if trimmed_output:
-    trimTempFile = input_path + ".tmp"
-    with open(input_path, 'r') as infile, open(trimTempFile, 'w') as outfile:
-        for line in infile:
-            match = re.match(r'^(\d+)\s+', line)
-            if match:
-                timestamp = int(match.group(1))
-                if timestamp <= last_time:
-                    outfile.write(line)
-            else:
-                outfile.write(line)
-    os.remove(input_path)
-    os.rename(trimTempFile, input_path)
+    # Stored as a window next to the log, the log itself is not rewritten
+    set_log_window(input_path, None, last_time + 1)
 
 print("\nSender Node | Avg Delay (s)  | Sent | Received | Success % | Throughput (Bps) | Avg Hops | Lines | Queue Full | TSCH Sends")
 print("------------|----------------|------|----------|-----------|------------------|----------|--------|-------------|-------------")
@@ -1,16 +1,11 @@
-import re
+from logparser import set_log_window
 
 last_time = 9121270000  # Replace with your actual value
 
 input_path = 'code/analyses/logfiles/TSCH_1_3.testlog'
-output_path = 'code/analyses/logfiles/TSCH_1_3_trimmed.testlog'
 
-with open(input_path, 'r') as infile, open(output_path, 'w') as outfile:
-    for line in infile:
-        match = re.match(r'^(\d+)\s+', line)
-        if match:
-            timestamp = int(match.group(1))
-            if timestamp <= last_time:
-                outfile.write(line)
-        else:
-            outfile.write(line)  # optionally keep non-timestamped lines
+# Trimming is stored next to the log (<log>.minutes.json) instead of writing
+# a trimmed copy: analysers reading the log through logparser stop at the
+# last line with a tick <= last_time. set_log_window(input_path) undoes it.
+window = set_log_window(input_path, None, last_time + 1)
+print(f"Trimmed {input_path} to lines 0-{window['end_line'] - 1} (ticks <= {last_time}).")
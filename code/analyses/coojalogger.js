@@ -2,16 +2,50 @@
 
 TIMEOUT(50000000); /* set timout, so script can run completely */
 
+/* End the run early once the traffic has drained: every node that sent a
+   message printed "All messages send" and the sink had no delivery for
+   quiet_period (simulated µs). 0 keeps running until the TIMEOUT above. */
+quiet_period = 60000000;
+sink_id = 16;
+
 log.log("Starting COOJA logger\n");
 
+/* Reaching the TIMEOUT means the traffic did not drain: the run failed,
+   unless quiet_period is 0 and the TIMEOUT is how every run ends. */
 timeout_function = function () {
     log.log("Script timed out.\n");
-    log.testOK();
+    if (quiet_period > 0) {
+        log.testFailed();
+    } else {
+        log.testOK();
+    }
 }
 
+senders = {};
+sender_count = 0;
+finished = {};
+finished_count = 0;
+last_delivery = 0;
+
 while (true) {
     if (msg) {
         log.log(time + " " + id + " " + msg + "\n");
+
+        if (msg.indexOf("Sending message") == 0 && !senders[id]) {
+            senders[id] = true;
+            sender_count++;
+        } else if (msg.indexOf("All messages send") == 0 && !finished[id]) {
+            finished[id] = true;
+            finished_count++;
+        } else if (id == sink_id && msg.indexOf("Data received from") == 0) {
+            last_delivery = time;
+        }
+
+        if (quiet_period > 0 && sender_count > 0 && finished_count >= sender_count
+                && time - last_delivery >= quiet_period) {
+            log.log("Traffic drained.\n");
+            log.testOK();
+        }
     }
 
     YIELD();
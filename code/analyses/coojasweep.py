@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import json
+import time
+import shlex
+import hashlib
+import functools
+import shutil
+import tempfile
+import argparse
+from subprocess import run, Popen, PIPE, STDOUT
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import TSCHCreateCSV
+import CSMACreateCSV
+from eventcache import ingest
+from summarycache import SummaryCache
+from logparser import compress_log, LogFollower, NetworkFormation, TEST_OK, MESSAGES_PER_NODE
+
+# === Parallel Cooja sweep ===
+# run-coojaTSCH.py and run-coojaCSMA.py edit code/sender-node.c and
+# coojalogger.js in place and share code/analyses/COOJA.testlog, so only one
+# simulation can run at a time. Here every run gets its own scratch copy of
+# the firmware sources, Makefile, .csc and logger script (laid out like
+# code/, so [CONFIG_DIR]/../sender-node.c still resolves), Cooja writes its
+# log there, and the log is moved to logfiles/<MAC>_<rate>_<batch>.testlog.
+# Runs are independent Cooja processes, so a thread pool is enough to keep
+# `jobs` of them busy. Logs that already exist are skipped, which makes an
+# interrupted sweep resumable; summarise them with the *CreateCSV scripts.
+
+SELF_PATH = os.path.dirname(os.path.abspath(__file__))
+CODE_PATH = os.path.dirname(SELF_PATH)
+CONTIKI_PATH = os.path.dirname(os.path.dirname(SELF_PATH))
+COOJA_PATH = "/home/ubuntu/contiki-ng/tools/cooja"
+LOG_DIR = os.path.join(SELF_PATH, "logfiles")
+BUILD_CACHE = os.path.join(SELF_PATH, "build_cache")
+
+FIRMWARE_FILES = ['sender-node.c', 'root-node.c', 'receiver-node.c', 'dis-sender.c', 'project-conf.h']
+MAC_SETTINGS = {
+    # makefile, default simulation
+    'TSCH': ('Makefile', 'simulation_NEW.csc'),
+    'CSMA': ('MakefileCSMA', 'simulation_CSMA_CA_28.csc'),
+}
+# The simulated time a run needs, as in sender-node.c: nothing is sent for
+# START_DELAY, then MESSAGES_PER_NODE messages at most (1 + JITTER_PERCENT
+# / 100) send intervals apart. The hard cap adds CAP_MARGIN_SECONDS for the
+# queues to empty on top of that.
+START_DELAY_SECONDS = 600
+SEND_JITTER = 1.0
+CAP_MARGIN_SECONDS = 1800
+
+TIMEOUT_PLACEHOLDER = 'XXXtimeoutXXX'
+TIMEOUT_RE = re.compile(r'TIMEOUT\(\d+\)')
+QUIET_RE = re.compile(r'^quiet_period = \d+;', re.MULTILINE)
+QUIET_SECONDS = 60  # coojalogger.js ends a run this long after the last delivery once all senders are done
+MOTE_ID_RE = re.compile(r'ContikiMoteID\s*<id>(\d+)</id>')
+
+
+def rate_name(rate):
+    return f"{rate:g}"
+
+
+def log_name(mac, rate, batch, compression):
+    return f"{mac}_{rate_name(rate)}_{batch}.testlog" + (f".{compression}" if compression else "")
+
+
+# === Firmware parameters and build cache ===
+# The firmware sources are never edited: run parameters are passed to the
+# compiler as Contiki DEFINES (-D flags) from the workspace Makefile, and
+# sender-node.c falls back to its own defaults without them. The build/
+# tree of a successful run is kept in build_cache/<key>, keyed by a hash of
+# the sources, the Makefile and the parameters, and copied into the next
+# workspace with the same key, so make finds the objects up to date and
+# every distinct (MAC, rate) is compiled once for all its batches.
+
+def firmware_params(rate):
+    return {'SEND_INTERVAL_SECONDS': rate_name(rate)}
+
+
+def firmware_makefile(mac, params):
+    """The MAC's Makefile with the parameters added as DEFINES."""
+    with open(os.path.join(CODE_PATH, MAC_SETTINGS[mac][0]), 'r') as file:
+        makefile = file.read()
+    defines = ''.join(f"DEFINES += {name}={value}\n" for name, value in sorted(params.items()))
+    return defines + '\n' + makefile
+
+
+def firmware_key(mac, params):
+    digest = hashlib.sha256(firmware_makefile(mac, params).encode())
+    for name in FIRMWARE_FILES:
+        path = os.path.join(CODE_PATH, name)
+        if os.path.exists(path):
+            digest.update(name.encode())
+            with open(path, 'rb') as file:
+                digest.update(file.read())
+    return f"{mac}_{digest.hexdigest()[:16]}"
+
+
+def restore_build(code_dir, key):
+    """Copy the cached build/ tree of `key` into a workspace; returns True on a cache hit."""
+    cached = os.path.join(BUILD_CACHE, key)
+    if not os.path.isdir(cached):
+        return False
+    shutil.copytree(cached, os.path.join(code_dir, 'build'))
+    return True
+
+
+def store_build(code_dir, key):
+    """Keep the build/ tree of a finished run under `key`, unless another run already did."""
+    build_dir = os.path.join(code_dir, 'build')
+    cached = os.path.join(BUILD_CACHE, key)
+    if os.path.isdir(cached) or not os.path.isdir(build_dir):
+        return
+    os.makedirs(BUILD_CACHE, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=key + '.', dir=BUILD_CACHE)
+    shutil.copytree(build_dir, os.path.join(tmp_dir, 'build'))
+    try:
+        os.rename(os.path.join(tmp_dir, 'build'), cached)
+    except OSError:
+        pass  # a concurrent run stored the same firmware first
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+# === Workspace templating ===
+def default_cap_seconds(rate, quiet=QUIET_SECONDS):
+    """Simulated seconds after which a run at this send interval is cut off."""
+    send_seconds = (MESSAGES_PER_NODE + 1) * rate * (1 + SEND_JITTER)
+    return START_DELAY_SECONDS + send_seconds + quiet + CAP_MARGIN_SECONDS
+
+
+def set_timeout(script, timeout):
+    """coojalogger.js with the simulation timeout set to `timeout` (placeholder or TIMEOUT(n) call)."""
+    if TIMEOUT_PLACEHOLDER in script:
+        return script.replace(TIMEOUT_PLACEHOLDER, str(timeout))
+    return TIMEOUT_RE.sub(f'TIMEOUT({timeout})', script, count=1)
+
+
+def set_quiet_period(script, seconds):
+    """coojalogger.js ending the run `seconds` of simulated time after the traffic drained (0: never)."""
+    return QUIET_RE.sub(f'quiet_period = {int(seconds * 1_000_000)};', script, count=1)
+
+
+def prepare_workspace(run_dir, mac, rate, csc_file, quiet=QUIET_SECONDS, max_minutes=None):
+    """Copy the firmware and simulation into run_dir/code for one run; returns (.csc path, firmware key).
+
+    Sources keep their mtimes, so a build/ tree restored from the cache is up to date for make.
+    The run ends `quiet` seconds after the traffic drained (see coojalogger.js) or at the hard
+    cap of `max_minutes` of simulated time, by default default_cap_seconds() for this rate.
+    """
+    params = firmware_params(rate)
+    key = firmware_key(mac, params)
+    code_dir = os.path.join(run_dir, 'code')
+    analyses_dir = os.path.join(code_dir, 'analyses')
+    os.makedirs(analyses_dir)
+
+    for name in FIRMWARE_FILES:
+        if os.path.exists(os.path.join(CODE_PATH, name)):
+            shutil.copy2(os.path.join(CODE_PATH, name), code_dir)
+    with open(os.path.join(code_dir, 'Makefile'), 'w') as file:
+        file.write(firmware_makefile(mac, params))
+    restore_build(code_dir, key)
+
+    with open(os.path.join(SELF_PATH, 'coojalogger.js'), 'r') as file:
+        script = file.read()
+    with open(os.path.join(analyses_dir, 'coojalogger.js'), 'w') as file:
+        timeout = int((max_minutes * 60 if max_minutes else default_cap_seconds(rate, quiet)) * 1000)  # ms
+        file.write(set_quiet_period(set_timeout(script, timeout), quiet))
+
+    csc_copy = os.path.join(analyses_dir, os.path.basename(csc_file))
+    shutil.copy2(csc_file, csc_copy)
+    return csc_copy, key
+
+
+# === Launching Cooja ===
+# `gradlew run` pays for Gradle configuration, the daemon handshake and task
+# up-to-date checks on every simulation. The launch (main class, JVM
+# arguments and runtime classpath of Cooja's run task) is resolved with
+# Gradle once, stored in build_cache/cooja-launch.json and reused to start
+# Cooja with plain `java` until Cooja's build files change or a jar on the
+# classpath disappears. The java executable is the one of the run task's
+# toolchain, so Cooja runs on the JDK Gradle would use; JAVA_HOME or java
+# on the PATH is only the fallback when Gradle has no launcher for it.
+
+LAUNCH_FILE = os.path.join(BUILD_CACHE, 'cooja-launch.json')
+LAUNCH_INIT_SCRIPT = """
+gradle.rootProject { project ->
+    project.afterEvaluate {
+        def run = project.tasks.findByName('run')
+        project.tasks.register('printCoojaLaunch') {
+            dependsOn run.classpath
+            doLast {
+                println 'COOJA_MAIN=' + run.mainClass.get()
+                println 'COOJA_CLASSPATH=' + run.classpath.asPath
+                run.allJvmArgs.each { println 'COOJA_JVM_ARG=' + it }
+                def launcher = run.hasProperty('javaLauncher') ? run.javaLauncher.getOrNull() : null
+                if (launcher) {
+                    println 'COOJA_JAVA=' + launcher.executablePath.asFile.absolutePath
+                }
+            }
+        }
+    }
+}
+"""
+
+
+def cooja_build_files():
+    return [os.path.join(COOJA_PATH, name) for name in ('build.gradle', 'build.gradle.kts', 'settings.gradle')
+            if os.path.exists(os.path.join(COOJA_PATH, name))]
+
+
+def resolve_cooja_launch():
+    """Ask Gradle once for the java executable, main class, JVM arguments and classpath of Cooja's run task."""
+    with tempfile.NamedTemporaryFile('w', suffix='.gradle', delete=False) as file:
+        file.write(LAUNCH_INIT_SCRIPT)
+    try:
+        proc = run([f"{COOJA_PATH}/gradlew", "-q", "-p", COOJA_PATH, "--init-script", file.name, "printCoojaLaunch"],
+                   stdout=PIPE, stderr=STDOUT, universal_newlines=True)
+    finally:
+        os.remove(file.name)
+    launch = {'java': None, 'main': None, 'classpath': [], 'jvm_args': []}
+    for line in proc.stdout.splitlines():
+        if line.startswith('COOJA_JAVA='):
+            launch['java'] = line[len('COOJA_JAVA='):]
+        elif line.startswith('COOJA_MAIN='):
+            launch['main'] = line[len('COOJA_MAIN='):]
+        elif line.startswith('COOJA_CLASSPATH='):
+            launch['classpath'] = line[len('COOJA_CLASSPATH='):].split(os.pathsep)
+        elif line.startswith('COOJA_JVM_ARG='):
+            launch['jvm_args'].append(line[len('COOJA_JVM_ARG='):])
+    if proc.returncode != 0 or not launch['main']:
+        raise RuntimeError(f"Could not resolve the Cooja classpath:\n{proc.stdout}")
+    return launch
+
+
+def launch_is_current(launch):
+    built = max((os.path.getmtime(path) for path in cooja_build_files()), default=0)
+    # Launches stored before the java executable was resolved have no 'java' key
+    return (launch.get('resolved', 0) >= built and 'java' in launch
+            and (launch['java'] is None or os.path.exists(launch['java']))
+            and all(os.path.exists(path) for path in launch['classpath']))
+
+
+@functools.lru_cache(maxsize=None)
+def cooja_launch():
+    """The stored Cooja launch, resolved again with Gradle when it is missing or out of date."""
+    try:
+        with open(LAUNCH_FILE, 'r') as file:
+            launch = json.load(file)
+        if launch_is_current(launch):
+            return launch
+    except (FileNotFoundError, ValueError, KeyError):
+        pass
+    launch = resolve_cooja_launch()
+    launch['resolved'] = time.time()
+    os.makedirs(BUILD_CACHE, exist_ok=True)
+    tmp_file = LAUNCH_FILE + '.tmp'
+    with open(tmp_file, 'w') as file:
+        json.dump(launch, file)
+    os.replace(tmp_file, LAUNCH_FILE)
+    return launch
+
+
+def cooja_command(csc_file, log_dir, gradle=False):
+    """Argument list that runs one headless Cooja simulation, with java directly unless gradle=True."""
+    cooja_args = [f"--contiki={CONTIKI_PATH}", "--no-gui", f"--logdir={log_dir}", csc_file]
+    if gradle:
+        return [f"{COOJA_PATH}/gradlew", "--no-watch-fs", "--parallel", "--build-cache", "-p", COOJA_PATH, "run",
+                f"--args={shlex.join(cooja_args)}"]
+    launch = cooja_launch()
+    java = launch['java']
+    if java is None:
+        java = os.path.join(os.environ['JAVA_HOME'], 'bin', 'java') if 'JAVA_HOME' in os.environ else 'java'
+    return [java, *launch['jvm_args'], '-cp', os.pathsep.join(launch['classpath']), launch['main'], *cooja_args]
+
+
+# === Running ===
+# Cooja's log is followed while the simulation writes it: its events go to
+# the MAC's MeanSummary (the row TSCHCreateCSV / CSMACreateCSV would write)
+# and TEST OK is seen in the same stream, so when Cooja exits the summary
+# row is ready and the log is not read again. The row is stored in the
+# summary cache of logfiles/, so the CreateCSV scripts do not reparse it.
+
+POLL_SECONDS = 1
+SUMMARIES = {
+    'TSCH': ('TSCHCreateCSV', TSCHCreateCSV.MeanSummary, TSCHCreateCSV.ANALYSER_VERSION),
+    'CSMA': ('CSMACreateCSV', CSMACreateCSV.MeanSummary, CSMACreateCSV.ANALYSER_VERSION),
+}
+
+
+def run_cooja(csc_file, log_dir, gradle=False, consumers=()):
+    """Run one headless Cooja simulation, feeding the events of its log to each consumer.feed() as they are written.
+
+    Returns (ok, output); ok means Cooja exited normally after the script wrote TEST OK.
+    """
+    follower = LogFollower(os.path.join(log_dir, 'COOJA.testlog'))
+    ok = False
+    with open(os.path.join(log_dir, 'cooja.out'), 'w+') as output:
+        proc = Popen(cooja_command(csc_file, log_dir, gradle), cwd=COOJA_PATH, stdout=output, stderr=STDOUT,
+                     universal_newlines=True)
+        while True:
+            finished = proc.poll() is not None  # checked first, so the last poll sees everything Cooja wrote
+            for event in (follower.flush() if finished else follower.poll()[0]):
+                if event.kind == TEST_OK:
+                    ok = True
+                for consumer in consumers:
+                    consumer.feed(event)
+            if finished:
+                break
+            time.sleep(POLL_SECONDS)
+        output.seek(0)
+        return ok and proc.returncode == 0, output.read()
+
+
+def simulation_nodes(csc_file):
+    """Node ids of the motes in a simulation file."""
+    with open(csc_file, 'r') as file:
+        return sorted(set(MOTE_ID_RE.findall(file.read())), key=int)
+
+
+def formation_report(formation):
+    """One line on when the DODAG of a run was complete, from a NetworkFormation fed by run_cooja()."""
+    if formation.complete:
+        return f"network built at second {formation.built_tick / 1_000_000:.2f}"
+    return f"network not fully built ({len(formation.ready)} of {len(formation.expected_nodes)} nodes joined)"
+
+
+def timed_out(log_dir):
+    """True if the run in log_dir hit the hard cap: coojalogger.js wrote 'Script timed out.' at the end of its log."""
+    try:
+        with open(os.path.join(log_dir, 'COOJA.testlog'), 'rb') as file:
+            file.seek(max(0, os.path.getsize(file.name) - 4096))
+            return b'Script timed out.' in file.read()
+    except OSError:
+        return False
+
+
+def run_one(mac, rate, batch, csc_file, scratch, compression, keep, gradle=False, quiet=QUIET_SECONDS,
+            max_minutes=None):
+    """Run one (MAC, rate, batch) simulation in its own workspace; returns (saved log, summary row) or None."""
+    logfile = os.path.join(LOG_DIR, log_name(mac, rate, batch, compression))
+    run_dir = tempfile.mkdtemp(prefix=f"{mac}_{rate_name(rate)}_{batch}_", dir=scratch)
+    summary = SUMMARIES[mac][1]()
+    try:
+        csc_copy, key = prepare_workspace(run_dir, mac, rate, csc_file, quiet, max_minutes)
+        log_dir = os.path.dirname(csc_copy)
+        formation = NetworkFormation(simulation_nodes(csc_copy))
+        ok, output = run_cooja(csc_copy, log_dir, gradle, consumers=[summary, formation])
+        if not ok:
+            if timed_out(log_dir):
+                print(f"Failed {os.path.basename(logfile)}: the traffic did not drain before the hard cap "
+                      f"(workspace {run_dir})")
+            else:
+                print(f"Failed {os.path.basename(logfile)} (workspace {run_dir}):\n{output[-2000:]}")
+            keep = True
+            return None
+        print(f"{os.path.basename(logfile)}: {formation_report(formation)}")
+        store_build(os.path.dirname(log_dir), key)
+        compress_log(os.path.join(log_dir, 'COOJA.testlog'), logfile, compression)
+        ingest(logfile)
+        return logfile, summary.row(os.path.basename(logfile))
+    finally:
+        if not keep:
+            shutil.rmtree(run_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a sweep of Cooja simulations in parallel, one workspace per run.")
+    parser.add_argument("--mac", choices=sorted(MAC_SETTINGS), default='TSCH', help="MAC layer to simulate (default: TSCH)")
+    parser.add_argument("--rates", type=float, nargs='+', default=[20, 15, 10, 8, 5, 1],
+                        help="Send intervals in seconds (default: 20 15 10 8 5 1)")
+    parser.add_argument("--batches", type=int, nargs=2, default=[1, 30], metavar=('FIRST', 'LAST'),
+                        help="Batch numbers to run, inclusive (default: 1 30)")
+    parser.add_argument("--csc", help="Simulation file (default: the MAC's simulation in code/analyses)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Concurrent Cooja instances (default: CPU count)")
+    parser.add_argument("--scratch", help="Directory for the per-run workspaces (default: system temp dir)")
+    parser.add_argument("--compression", choices=['gz', 'zst', 'none'], default='gz', help="Saved log compression (default: gz)")
+    parser.add_argument("--keep", action="store_true", help="Keep the workspaces of successful runs")
+    parser.add_argument("--gradle", action="store_true", help="Start every run with gradlew instead of java")
+    parser.add_argument("--quiet", type=float, default=QUIET_SECONDS,
+                        help=f"End a run this many simulated seconds after the last delivery once every sender "
+                             f"is done, 0 to disable (default: {QUIET_SECONDS})")
+    parser.add_argument("--max-minutes", type=float,
+                        help="Hard cap on the simulated minutes of a run (default: the start delay and the "
+                             "messages at the rate, plus a margin)")
+    args = parser.parse_args()
+
+    compression = None if args.compression == 'none' else args.compression
+    csc_file = os.path.abspath(args.csc or os.path.join(SELF_PATH, MAC_SETTINGS[args.mac][1]))
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    runs = []
+    for rate in args.rates:
+        for batch in range(args.batches[0], args.batches[1] + 1):
+            if os.path.exists(os.path.join(LOG_DIR, log_name(args.mac, rate, batch, compression))):
+                print(f"Skipping {log_name(args.mac, rate, batch, compression)}, it already exists")
+            else:
+                runs.append((rate, batch))
+
+    if runs and not args.gradle:
+        cooja_launch()  # resolve the classpath once, before the workers start
+    print(f"Running {len(runs)} simulations, {args.jobs} at a time")
+    analyser, _, version = SUMMARIES[args.mac]
+    cache = SummaryCache(os.path.join(LOG_DIR, "summary_cache.json"), analyser, version)
+    failed = 0
+    # A run that raises (a failed build, a full disk) counts as failed; the
+    # rows of the runs that finished are saved even if the sweep is interrupted
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = {pool.submit(run_one, args.mac, rate, batch, csc_file, args.scratch, compression, args.keep,
+                                   args.gradle, args.quiet, args.max_minutes): (rate, batch)
+                       for rate, batch in runs}
+            for future in as_completed(futures):
+                rate, batch = futures[future]
+                try:
+                    result = future.result()
+                except Exception as error:
+                    print(f"Failed: rate {rate_name(rate)}, batch {batch}: {type(error).__name__}: {error}")
+                    result = None
+                if result:
+                    logfile, row = result
+                    cache.store(logfile, row)
+                    print(f"Done: rate {rate_name(rate)}, batch {batch} -> {logfile}")
+                else:
+                    failed += 1
+    finally:
+        cache.save(prune=False)
+    print(f"{len(runs) - failed} simulations done, {failed} failed")
+    if failed:
+        exit(-1)
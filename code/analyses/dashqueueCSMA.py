@@ -1,95 +1,47 @@
-import re
-from collections import defaultdict
-import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import argparse
+from eventcache import load_table, kind_mask, message_key, last_match
+from binning import bin_index, bin_count, bin_mean, bin_max, bin_frame, bin_start
+from logparser import SEND, RECV, NOT_FOR_US, SINK_NODE
 
 # === CLI Argument Configuration ===
 parser = argparse.ArgumentParser(description="Parse COOJA log and plot per-second metrics with latency.")
 parser.add_argument("input_path", help="Path to the COOJA log file")
+parser.add_argument("--bin", type=float, default=1, help="Bin width in seconds (default: 1)")
 args = parser.parse_args()
 
 logfile = args.input_path
 
-# === Initialize data containers ===
-sent_per_second = defaultdict(int)
-received_per_second = defaultdict(int)
-recv_bytes_per_second = defaultdict(int)
-not_for_us_per_second = defaultdict(int)
-queue_length_per_second = defaultdict(list)
-latency_per_second = defaultdict(list)
-sent_messages = {}
+# === Event table ===
+table = load_table(logfile)
+bins = bin_index(table['tick'], args.bin)
+lineno, key = table['lineno'], message_key(table)
 
-# === Parse the log file ===
-with open(logfile, 'r') as file:
-    for line in file:
-        tick_match = re.match(r'^(\d+)', line)
-        if not tick_match:
-            continue
-        tick = int(tick_match.group(1))
-        second = tick // 1_000_000
+sends = kind_mask(table, SEND)
+recvs = kind_mask(table, RECV) & (table['node'] == int(SINK_NODE)) & (table['value'] >= 0)
+not_for_us = kind_mask(table, NOT_FOR_US)
+queues = (table['tick'] >= 0) & (table['q1'] >= 0) & (table['q2'] < 0)
 
-        # Detect sent message
-        send_match = re.match(r'^\d+\s+(\d+)\s+Sending message: \'(.+?)\' to fd00::210:10:10:10', line)
-        if send_match:
-            sender = send_match.group(1)
-            msg = send_match.group(2).strip()
-            sent_messages[msg] = tick
-            sent_per_second[second] += 1
-
-        # Detect received message and map back to sent second
-        recv_match = re.match(r'^(\d+)\s+16\s+Data received from .*? in (\d+) hops with datalength \d+: \'(.+?)\'', line)
-        if recv_match:
-            recv_tick = int(recv_match.group(1))
-            msg = recv_match.group(3).strip()
-
-            if msg in sent_messages:
-                sent_tick = sent_messages[msg]
-                sent_sec = sent_tick // 1_000_000
-                latency_ms = (recv_tick - sent_tick) / 1000
-                received_per_second[sent_sec] += 1
-                recv_bytes_per_second[sent_sec] += len(msg)
-                latency_per_second[sent_sec].append(latency_ms)
-
-        # Detect "not for us"
-        not_for_us_match = re.match(r'^\d+\s+(\d+)\s+\[WARN: CSMA\s+\]\s+not for us', line)
-        if not_for_us_match:
-            not_for_us_per_second[second] += 1
-
-        # Detect queue length
-        queue_match = re.search(r'queue length (\d+)', line)
-        if queue_match:
-            queue_len = int(queue_match.group(1))
-            queue_length_per_second[second].append(queue_len)
+# Received messages are counted in the bin they were sent in
+stored = sends & (table['seq'] >= 0)  # sends without a decodable payload can't be matched
+sent = last_match(key[stored], lineno[stored], key[recvs], lineno[recvs])
+matched = sent >= 0
+sent_ticks = table['tick'][stored][sent[matched]]
+sent_bins = bins[stored][sent[matched]]
+latency_ms = (table['tick'][recvs][matched] - sent_ticks) / 1000
 
 # === Build DataFrame ===
-all_seconds = sorted(set(sent_per_second) |
-                     set(received_per_second) |
-                     set(not_for_us_per_second) |
-                     set(queue_length_per_second))
-
-records = []
-for second in all_seconds:
-    sent = sent_per_second.get(second, 0)
-    recv = received_per_second.get(second, 0)
-    success = (recv / sent * 100) if sent > 0 else 0
-    datarate = recv_bytes_per_second.get(second, 0)
-    not_for_us = not_for_us_per_second.get(second, 0)
-    queue_max = max(queue_length_per_second[second]) if queue_length_per_second[second] else 0
-    avg_latency = sum(latency_per_second[second]) / len(latency_per_second[second]) if latency_per_second[second] else 0
-
-    records.append({
-        "Second": second,
-        "Sent": sent,
-        "Received": recv,
-        "Throughput %": success,
-        "Datarate (Bps)": datarate,
-        "Not-for-us": not_for_us,
-        "Queue Length": queue_max,
-        "End-to-End latency(ms)": avg_latency
-    })
-
-df = pd.DataFrame(records)
+df = bin_frame({
+    "Sent": bin_count(bins[sends]),
+    "Received": bin_count(sent_bins),
+    "Datarate (Bps)": bin_count(sent_bins, table['length'][recvs][matched]).astype(np.int64),
+    "Not-for-us": bin_count(bins[not_for_us]),
+    "Queue Length": bin_max(bins[queues], table['q1'][queues]),
+    "End-to-End latency(ms)": bin_mean(sent_bins, latency_ms),
+})
+df.insert(0, "Second", bin_start(df.index, args.bin, unit=1))
+df.insert(3, "Throughput %", np.where(df["Sent"] > 0, df["Received"] / df["Sent"].clip(lower=1) * 100, 0))
 
 # === Plotly Chart ===
 fig = go.Figure()
@@ -102,8 +54,8 @@ fig.add_trace(go.Scatter(x=df["Second"], y=df["Queue Length"], mode='lines+marke
 fig.add_trace(go.Scatter(x=df["Second"], y=df["End-to-End latency(ms)"], mode='lines+markers', name='End-to-End latency(ms)'))
 
 # === Summary ===
-total_sent = sum(sent_per_second.values())
-total_recv = sum(received_per_second.values())
+total_sent = int(sends.sum())
+total_recv = int(matched.sum())
 overall_success = (total_recv / total_sent * 100) if total_sent > 0 else 0
 
 fig.update_layout(
@@ -1,152 +1,288 @@
-from dash import Dash, dcc, html
-from dash.dependencies import Input, Output
+from dash import Dash, dcc, html, no_update
+from dash.dependencies import Input, Output, State
 import plotly.graph_objects as go
 import pandas as pd
-import re
 from collections import defaultdict
+from plotly.subplots import make_subplots
+import plotly.io as pio
 import argparse
+import threading
+import time
+import os
+from logparser import LogFollower, SEND, RECV, TSCH_SEND, TEST_OK, SINK_NODE
 
 # === Configuration ===
 parser = argparse.ArgumentParser(description="Parse COOJA test log.")
-parser.add_argument("input_path", help="Path to the COOJA log file")
+parser.add_argument("input_path", help="Path to the COOJA log file, or a directory to watch all runs below it")
+parser.add_argument("--active", type=float, default=300,
+                    help="With a directory: only pick up logs written in the last N seconds (default: 300)")
 args = parser.parse_args()
 
 logfile = args.input_path
 queue = 64
 num_senders = 20
+DISCOVER_EVERY = 5  # seconds between directory scans
 
-app = Dash(__name__)
-app.title = "COOJA Live Queue & Reception Monitor"
 
-app.layout = html.Div([
-    html.H2(f"Live TSCH Queue Fill, Reception & Latency ({logfile})"),
-    dcc.Graph(id='live-graph'),
-    dcc.Interval(id='interval-component', interval=2 * 1000, n_intervals=0)
-])
+# === Running per-minute aggregates ===
+# Fed with the events of newly appended lines only, so a refresh costs the
+# same after two hours of simulation as after two minutes.
+class LiveStats:
+    def __init__(self):
+        self.queue1_per_minute = {}
+        self.queue2_per_minute = {}
+        self.recv_per_minute = defaultdict(int)
+        self.avg_sent_per_minute = defaultdict(float)
+        self.confirmed_sent_per_minute = defaultdict(set)
+        self.last_sent_message = {}
+        self.latency_per_minute = defaultdict(lambda: [0, 0])  # minute -> [sum, count]
+        self.message_send_tick = {}
+
+        self.total_sent_messages = 0
+        self.total_received_messages = 0
+        self.current_minute = 0
+        self.finished = False
+
+    def feed(self, event):
+        if event.kind == TEST_OK:
+            self.finished = True  # the last minute is complete too
+        if event.tick is None:
+            return
+        tick = event.tick
+        minute = tick // 1_000_000 // 60
+        self.current_minute = max(self.current_minute, minute)
+
+        if event.q2 is not None:
+            self.queue1_per_minute[minute] = max(self.queue1_per_minute.get(minute, event.q1), event.q1)
+            self.queue2_per_minute[minute] = max(self.queue2_per_minute.get(minute, event.q2), event.q2)
+
+        if event.kind == SEND:
+            node = event.node
+            msg_id = (event.sender, event.seq)
+            self.last_sent_message[node] = msg_id
+            self.message_send_tick[msg_id] = tick
+            self.total_sent_messages += 1
+            self.avg_sent_per_minute[minute] += 1 / num_senders
+
+        elif event.kind == TSCH_SEND and event.sender == 1:  # to 0001.0001.0001.0001
+            node = event.node
+            if node in self.last_sent_message:
+                msg_id = self.last_sent_message[node]
+                self.confirmed_sent_per_minute[minute].add((node, msg_id))
+
+        elif event.kind == RECV and event.node == SINK_NODE:
+            recv_tick = event.tick
+            msg_id = (event.sender, event.seq)
+            recv_minute = recv_tick // 1_000_000 // 60
+
+            if msg_id in self.message_send_tick:
+                latency = self.latency_per_minute[recv_minute]
+                latency[0] += (recv_tick - self.message_send_tick[msg_id]) / 1000000
+                latency[1] += 1
 
-@app.callback(Output('live-graph', 'figure'), [Input('interval-component', 'n_intervals')])
-def update_graph(n):
-    queue1_per_minute = defaultdict(list)
-    queue2_per_minute = defaultdict(list)
-    recv_per_minute = defaultdict(int)
-    avg_sent_per_minute = defaultdict(float)
-    confirmed_sent_per_minute = defaultdict(set)
-    last_sent_message = {}
-    latency_per_minute = defaultdict(list)
-    message_send_tick = {}
-
-    total_sent_messages = 0
-    total_received_messages = 0
-
-    try:
-        with open(logfile, 'r') as file:
-            lines = list(file)
-
-        for line in lines:
-            tick_match = re.match(r'^(\d+)', line)
-            if not tick_match:
+            self.recv_per_minute[recv_minute] += 1
+            self.total_received_messages += 1
+
+    def records(self, after=-1):
+        """Per-minute rows of the completed minutes after `after`; the current one stays open until TEST OK."""
+        all_minutes = sorted(minute for minute in (set(self.queue1_per_minute) |
+                                                   set(self.queue2_per_minute) |
+                                                   set(self.recv_per_minute) |
+                                                   set(self.avg_sent_per_minute) |
+                                                   set(self.confirmed_sent_per_minute) |
+                                                   set(self.latency_per_minute))
+                             if after < minute and (minute < self.current_minute or self.finished))
+
+        records = []
+        for minute in all_minutes:
+            latency_sum, latency_count = self.latency_per_minute.get(minute, (0, 0))
+            avg_latency = latency_sum / latency_count if latency_count else 0
+
+            records.append({
+                "Minute": minute,
+                "Queue 1": self.queue1_per_minute.get(minute, 0),
+                "Queue 2": self.queue2_per_minute.get(minute, 0),
+                "Messages Received (Node 16)": self.recv_per_minute.get(minute, 0),
+                "Avg Sent": self.avg_sent_per_minute.get(minute, 0),
+                "Confirmed Sent": len(self.confirmed_sent_per_minute.get(minute, set())) / num_senders,
+                "Avg Latency (s)": int(avg_latency)
+            })
+        return records
+
+
+class Run:
+    """Incremental parser and aggregates of one log."""
+
+    def __init__(self, path):
+        self.path = path
+        self.follower = LogFollower(path)
+        self.stats = LiveStats()
+        self.generation = 0  # bumped when the log restarts, so browsers rebuild their figure
+
+    def poll(self):
+        events, restarted = self.follower.poll()
+        if restarted:
+            self.stats = LiveStats()  # log truncated or replaced by the next batch
+            self.generation += 1
+        for event in events:
+            self.stats.feed(event)
+
+
+# === Run discovery ===
+# With a directory, every plain .testlog below it that was written in the
+# last --active seconds gets its own Run; a Run is kept until its file is
+# gone, so finished runs of a sweep stay on screen.
+def discover():
+    if not watch_dir:
+        return [logfile]
+    now = time.time()
+    found = []
+    for root, dirs, files in os.walk(logfile):
+        for filename in files:
+            if not filename.endswith('.testlog'):
                 continue
-            tick = int(tick_match.group(1))
-            minute = tick // 1_000_000 // 60
-
-            match_queue = re.search(fr'queue\s+(\d+)/{queue}\s+(\d+)/{queue}', line)
-            if match_queue:
-                q1 = int(match_queue.group(1))
-                q2 = int(match_queue.group(2))
-                queue1_per_minute[minute].append(q1)
-                queue2_per_minute[minute].append(q2)
-
-            send_match = re.match(r'^\d+\s+(\d+)\s+Sending message: \'Msg (.+?)\' to', line)
-            if send_match:
-                node = send_match.group(1)
-                msg_id = send_match.group(2).strip()
-                last_sent_message[node] = msg_id
-                message_send_tick[msg_id] = tick
-                total_sent_messages += 1
-                avg_sent_per_minute[minute] += 1 / num_senders
-
-            tsch_match = re.match(r'^\d+\s+(\d+)\s+\[INFO: TSCH\s+\] send packet to 0001.0001.0001.0001', line)
-            if tsch_match:
-                node = tsch_match.group(1)
-                if node in last_sent_message:
-                    msg_id = last_sent_message[node]
-                    confirmed_sent_per_minute[minute].add((node, msg_id))
-
-            match_recv = re.match(r'^(\d+)\s+16\s+Data received from .*?: \'Msg (.+?)\'', line)
-            if match_recv:
-                recv_tick = int(match_recv.group(1))
-                msg_id = match_recv.group(2).strip()
-                recv_minute = recv_tick // 1_000_000 // 60
-
-                if msg_id in message_send_tick:
-                    latency_ms = (recv_tick - message_send_tick[msg_id]) / 1000000
-                    latency_per_minute[recv_minute].append(latency_ms)
-                
-                recv_per_minute[recv_minute] += 1
-                total_received_messages += 1
-
-    except FileNotFoundError:
-        return go.Figure()
+            path = os.path.join(root, filename)
+            try:
+                if path in runs or now - os.path.getmtime(path) < args.active:
+                    found.append(path)
+            except FileNotFoundError:
+                pass
+    return sorted(found)
 
-    success_rate = (total_received_messages / total_sent_messages * 100) if total_sent_messages > 0 else 0
 
-    all_minutes = sorted(set(queue1_per_minute) |
-                         set(queue2_per_minute) |
-                         set(recv_per_minute) |
-                         set(avg_sent_per_minute) |
-                         set(confirmed_sent_per_minute) |
-                         set(latency_per_minute))
-
-    records = []
-    for minute in all_minutes:
-        received = recv_per_minute.get(minute, 0)
-        avg_q1 = max(queue1_per_minute[minute]) if queue1_per_minute[minute] else 0
-        avg_q2 = max(queue2_per_minute[minute]) if queue2_per_minute[minute] else 0
-        confirmed = len(confirmed_sent_per_minute.get(minute, set())) / num_senders
-        avg_sent = avg_sent_per_minute.get(minute, 0)
-        avg_latency = sum(latency_per_minute[minute]) / len(latency_per_minute[minute]) if latency_per_minute[minute] else 0
-
-        records.append({
-            "Minute": minute,
-            "Queue 1": avg_q1,
-            "Queue 2": avg_q2,
-            "Messages Received (Node 16)": received,
-            "Avg Sent": avg_sent,
-            "Confirmed Sent": confirmed,
-            "Avg Latency (s)": int(avg_latency)
-        })
-
-    df = pd.DataFrame(records)
-
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=df["Minute"], y=df["Queue 1"], mode="lines+markers", name="Max Queue 1", line=dict(dash="dot"), yaxis="y1"))
-    fig.add_trace(go.Scatter(x=df["Minute"], y=df["Queue 2"], mode="lines+markers", name="Max Queue 2", line=dict(dash="dot"), yaxis="y1"))
-    fig.add_trace(go.Scatter(x=df["Minute"], y=df["Messages Received (Node 16)"], mode="lines+markers", name="Received", line=dict(width=3), yaxis="y2"))
-    fig.add_trace(go.Scatter(x=df["Minute"], y=df["Confirmed Sent"], mode="lines+markers", name="Confirmed Sent", line=dict(dash="dash"), yaxis="y2"))
-    fig.add_trace(go.Scatter(x=df["Minute"], y=df["Avg Sent"], mode="lines+markers", name="Avg Sent", line=dict(dash="dot"), yaxis="y2"))
-    fig.add_trace(go.Scatter(x=df["Minute"], y=df["Avg Latency (s)"], mode="lines+markers", name="Avg Latency (s)", line=dict(dash="solid"), yaxis="y2"))
+def update_runs():
+    global last_discovery
+
+    if time.time() - last_discovery >= DISCOVER_EVERY:
+        last_discovery = time.time()
+        paths = discover()
+        for path in list(runs):
+            if path not in paths:
+                del runs[path]
+        for path in paths:
+            if path not in runs:
+                runs[path] = Run(path)
+    for run in runs.values():
+        run.poll()
+
 
+def run_name(path):
+    return os.path.relpath(path, logfile) if watch_dir else path
+
+
+COLUMNS = ["Queue 1", "Queue 2", "Messages Received (Node 16)", "Confirmed Sent", "Avg Sent", "Avg Latency (s)"]
+TRACES = [  # (column, name, line, secondary y)
+    ("Queue 1", "Max Queue 1", dict(dash="dot"), False),
+    ("Queue 2", "Max Queue 2", dict(dash="dot"), False),
+    ("Messages Received (Node 16)", "Received", dict(width=3), True),
+    ("Confirmed Sent", "Confirmed Sent", dict(dash="dash"), True),
+    ("Avg Sent", "Avg Sent", dict(dash="dot"), True),
+    ("Avg Latency (s)", "Avg Latency (s)", dict(dash="solid"), True),
+]
+
+
+def build_figure(run_records):
+    """One row per run, sharing the minute axis and the queue / message axes."""
+    names = list(run_records)
+    # The spacing is a fraction of the whole figure; it must stay below 1 / (rows - 1)
+    fig = make_subplots(rows=len(names), cols=1, shared_xaxes=True,
+                        vertical_spacing=min(0.06, 0.3 / max(len(names) - 1, 1)),
+                        specs=[[{"secondary_y": True}]] * len(names),
+                        subplot_titles=[run_name(name) for name in names] if watch_dir else None)
+    colors = pio.templates["plotly_white"].layout.colorway
+
+    for row, name in enumerate(names, start=1):
+        df = pd.DataFrame(run_records[name], columns=["Minute"] + COLUMNS)
+        for i, (column, trace_name, line, secondary_y) in enumerate(TRACES):
+            fig.add_trace(go.Scatter(x=df["Minute"], y=df[column], mode="lines+markers", name=trace_name,
+                                     line=dict(line, color=colors[i]), legendgroup=trace_name, showlegend=row == 1),
+                          row=row, col=1, secondary_y=secondary_y)
+        if row > 1:
+            fig.update_yaxes(matches="y", row=row, col=1, secondary_y=False)
+            fig.update_yaxes(matches="y2", row=row, col=1, secondary_y=True)
+
+    fig.update_xaxes(title_text="Time (minutes)", row=len(names), col=1)
+    fig.update_yaxes(title_text=f"Avg Queue Fill (0–{queue})", secondary_y=False)
+    fig.update_yaxes(title_text="Messages / Minute & Latency", secondary_y=True)
     fig.update_layout(
         title=f"Received Messages and Latency per Minute ({logfile})",
-        xaxis=dict(title="Time (minutes)"),
-        yaxis=dict(title=f"Avg Queue Fill (0–{queue})", side="left"),
-        yaxis2=dict(title="Messages / Minute & Latency", overlaying="y", side="right"),
         legend_title_text="Legend",
         template="plotly_white",
-        height=650,
-        annotations=[
-            dict(
-                xref='paper', yref='paper',
-                x=0.01, y=1.05,
-                xanchor='left', yanchor='bottom',
-                text=f"\U0001F4E6 Sent: <b>{total_sent_messages}</b> | \u2705 Received: <b>{total_received_messages}</b> | \U0001F4C8 Success rate: <b>{success_rate:.1f}%</b>",
-                showarrow=False,
-                font=dict(size=14)
-            )
-        ]
+        height=max(650, 350 * len(names)),
+        uirevision=logfile  # keep zoom when the figure is rebuilt
     )
-
     return fig
 
+
+def totals_text(name, total_sent_messages, total_received_messages):
+    success_rate = (total_received_messages / total_sent_messages * 100) if total_sent_messages > 0 else 0
+    return html.Div([f"{run_name(name)}: " if watch_dir else "",
+                     "\U0001F4E6 Sent: ", html.B(total_sent_messages), " | \u2705 Received: ", html.B(total_received_messages),
+                     " | \U0001F4C8 Success rate: ", html.B(f"{success_rate:.1f}%")])
+
+
+watch_dir = os.path.isdir(logfile)
+runs = {}  # log path -> Run
+last_discovery = 0
+lock = threading.Lock()  # the Dash server may run two refreshes at once
+
+app = Dash(__name__)
+app.title = "COOJA Live Queue & Reception Monitor"
+
+# === Push-based updates ===
+# The browser keeps its figure; every tick the server only sends the
+# minutes that completed since the last push (dcc.Store 'pushed' tells
+# which, per run) through the graph's extendData. The minute a log is
+# still in is not plotted yet, its aggregates can still change. A full
+# figure is sent on page load, when the selected runs change and after a
+# log was truncated or replaced.
+app.layout = html.Div([
+    html.H2(f"Live TSCH Queue Fill, Reception & Latency ({logfile})"),
+    dcc.Dropdown(id='runs', multi=True, placeholder="All active runs",
+                 style=dict(display="block" if watch_dir else "none")),
+    html.Div(id='totals', style=dict(fontSize=14)),
+    dcc.Graph(id='live-graph'),
+    dcc.Store(id='pushed'),
+    dcc.Interval(id='interval-component', interval=500, n_intervals=0)
+])
+
+@app.callback([Output('live-graph', 'figure'), Output('live-graph', 'extendData'),
+               Output('totals', 'children'), Output('pushed', 'data'), Output('runs', 'options')],
+              [Input('interval-component', 'n_intervals'), Input('runs', 'value')], [State('pushed', 'data')])
+def update_graph(n, selected, pushed):
+    with lock:
+        update_runs()
+        options = [{"label": run_name(path), "value": path} for path in runs]
+        shown = [run for path, run in runs.items()
+                 if (not selected or path in selected) and run.follower.identity is not None]
+        if not shown:
+            return go.Figure(), no_update, None, None, options
+
+        layout = [[run.path, run.generation] for run in shown]
+        fresh = pushed is None or pushed['layout'] != layout
+        last_pushed = {} if fresh else pushed['minutes']
+        run_records = {run.path: run.stats.records(after=last_pushed.get(run.path, -1)) for run in shown}
+        totals = [totals_text(run.path, run.stats.total_sent_messages, run.stats.total_received_messages)
+                  for run in shown]
+        state = {'layout': layout,
+                 'minutes': {path: records[-1]["Minute"] if records else last_pushed.get(path, -1)
+                             for path, records in run_records.items()}}
+
+    if fresh:
+        return build_figure(run_records), no_update, totals, state, options
+    if not any(run_records.values()):
+        return no_update, no_update, totals, no_update, options
+
+    extend = dict(x=[], y=[])
+    indices = []
+    for row, records in enumerate(run_records.values()):
+        if not records:
+            continue
+        for i, (column, _, _, _) in enumerate(TRACES):
+            extend['x'].append([r["Minute"] for r in records])
+            extend['y'].append([r[column] for r in records])
+            indices.append(row * len(TRACES) + i)
+    return no_update, (extend, indices), totals, state, options
+
 if __name__ == "__main__":
     app.run(debug=True)
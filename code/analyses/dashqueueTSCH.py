@@ -1,122 +1,58 @@
-import re
-from collections import defaultdict
-import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 import argparse
+from eventcache import load_table, kind_mask, message_key, last_match
+from binning import bin_index, bin_count, bin_mean, bin_max, bin_frame, bin_start
+from logparser import SEND, RECV, TSCH_SEND, TRICKLE_DOUBLED, SINK_NODE
 
 # === CLI Arguments ===
 parser = argparse.ArgumentParser(description="Parse COOJA test log and plot per-minute stats with Trickle resets.")
 parser.add_argument("input_path", help="Path to the COOJA log file")
+parser.add_argument("--bin", type=float, default=60, help="Bin width in seconds (default: 60)")
 args = parser.parse_args()
 
 logfile = args.input_path
 queue = 64
 num_senders = 20
 
-# === Data containers ===
-queue1_per_minute = defaultdict(list)
-queue2_per_minute = defaultdict(list)
-recv_per_minute = defaultdict(int)
-avg_sent_per_minute = defaultdict(float)
-confirmed_sent_per_minute = defaultdict(set)
-last_sent_message = {}
-latency_per_minute = defaultdict(list)
-message_send_tick = {}
-resets_per_minute = defaultdict(int)
-
-total_sent_messages = 0
-total_received_messages = 0
-
-# === Log parsing ===
-with open(logfile, 'r') as file:
-    lines = list(file)
-
-for line in lines:
-    tick_match = re.match(r'^(\d+)', line)
-    if not tick_match:
-        continue
-    tick = int(tick_match.group(1))
-    minute = tick // 1_000_000 // 60
-
-    # Queue fill
-    match_queue = re.search(fr'queue\s+(\d+)/{queue}\s+(\d+)/{queue}', line)
-    if match_queue:
-        q1 = int(match_queue.group(1))
-        q2 = int(match_queue.group(2))
-        queue1_per_minute[minute].append(q1)
-        queue2_per_minute[minute].append(q2)
-
-    # Message sent
-    send_match = re.match(r'^\d+\s+(\d+)\s+Sending message: \'Msg (.+?)\' to', line)
-    if send_match:
-        node = send_match.group(1)
-        msg_id = send_match.group(2).strip()
-        last_sent_message[node] = msg_id
-        message_send_tick[msg_id] = tick
-        total_sent_messages += 1
-        avg_sent_per_minute[minute] += 1 / num_senders
-
-    # Confirmed TSCH send
-    tsch_match = re.match(r'^\d+\s+(\d+)\s+\[INFO: TSCH\s+\] send packet to 0001.0001.0001.0001', line)
-    if tsch_match:
-        node = tsch_match.group(1)
-        if node in last_sent_message:
-            msg_id = last_sent_message[node]
-            confirmed_sent_per_minute[minute].add((node, msg_id))
-
-    # Received
-    match_recv = re.match(r'^(\d+)\s+16\s+Data received from .*?: \'Msg (.+?)\'', line)
-    if match_recv:
-        recv_tick = int(match_recv.group(1))
-        msg_id = match_recv.group(2).strip()
-        recv_minute = recv_tick // 1_000_000 // 60
-
-        if msg_id in message_send_tick:
-            latency_s = (recv_tick - message_send_tick[msg_id]) / 1_000_000
-            latency_per_minute[recv_minute].append(latency_s)
-
-        recv_per_minute[recv_minute] += 1
-        total_received_messages += 1
-
-    # Trickle resets
-    if "DIO Timer interval doubled" in line:
-        resets_per_minute[minute] += 1
-
-# === Compute summary stats ===
+# === Event table ===
+table = load_table(logfile)
+bins = bin_index(table['tick'], args.bin)
+lineno, node, key = table['lineno'], table['node'], message_key(table)
+
+queues = (table['tick'] >= 0) & (table['q2'] >= 0)
+sends = kind_mask(table, SEND)
+recvs = kind_mask(table, RECV) & (node == int(SINK_NODE))
+resets = kind_mask(table, TRICKLE_DOUBLED)
+
+# Confirmed TSCH send: the last message the node sent before it, once per bin
+confirms = np.flatnonzero(kind_mask(table, TSCH_SEND) & (table['sender'] == 1))  # to 0001.0001.0001.0001
+last_sent = last_match(node[sends], lineno[sends], node[confirms], lineno[confirms])
+confirmed = np.unique(np.column_stack([bins[confirms], key[sends][last_sent]])[last_sent >= 0], axis=0)
+
+# Latency of received messages, from the last send of the same message
+send_ticks = table['tick'][sends]
+sent = last_match(key[sends], lineno[sends], key[recvs], lineno[recvs])
+matched = sent >= 0
+latency_s = (table['tick'][recvs][matched] - send_ticks[sent[matched]]) / 1_000_000
+
+# === Per-bin stats ===
+total_sent_messages = int(sends.sum())
+total_received_messages = int(recvs.sum())
 success_rate = (total_received_messages / total_sent_messages * 100) if total_sent_messages > 0 else 0
-total_resets = sum(resets_per_minute.values())
-total_confirmed_sent = sum(len(v) for v in confirmed_sent_per_minute.values())
-
-all_minutes = sorted(set(queue1_per_minute) |
-                     set(queue2_per_minute) |
-                     set(recv_per_minute) |
-                     set(avg_sent_per_minute) |
-                     set(confirmed_sent_per_minute) |
-                     set(latency_per_minute) |
-                     set(resets_per_minute))
-
-records = []
-for minute in all_minutes:
-    received = recv_per_minute.get(minute, 0)
-    avg_q1 = max(queue1_per_minute[minute]) if queue1_per_minute[minute] else 0
-    avg_q2 = max(queue2_per_minute[minute]) if queue2_per_minute[minute] else 0
-    confirmed = len(confirmed_sent_per_minute.get(minute, set())) / num_senders
-    avg_sent = avg_sent_per_minute.get(minute, 0)
-    avg_latency = sum(latency_per_minute[minute]) / len(latency_per_minute[minute]) if latency_per_minute[minute] else 0
-    resets = resets_per_minute.get(minute, 0)
-
-    records.append({
-        "Minute": minute,
-        "Queue 1": avg_q1,
-        "Queue 2": avg_q2,
-        "Messages Received (Node 16)": received,
-        "Avg Sent": avg_sent,
-        "Confirmed Sent": confirmed,
-        "Avg Latency (s)": round(avg_latency, 3),
-        "Trickle Resets": resets
-    })
-
-df = pd.DataFrame(records)
+total_resets = int(resets.sum())
+total_confirmed_sent = len(confirmed)
+
+df = bin_frame({
+    "Queue 1": bin_max(bins[queues], table['q1'][queues]),
+    "Queue 2": bin_max(bins[queues], table['q2'][queues]),
+    "Messages Received (Node 16)": bin_count(bins[recvs]),
+    "Avg Sent": bin_count(bins[sends], np.full(total_sent_messages, 1 / num_senders)),
+    "Confirmed Sent": bin_count(confirmed[:, 0]) / num_senders,
+    "Avg Latency (s)": bin_mean(bins[recvs][matched], latency_s).map(lambda latency: round(latency, 3)),
+    "Trickle Resets": bin_count(bins[resets]),
+})
+df.insert(0, "Minute", bin_start(df.index, args.bin))
 
 # === Plotly Graph ===
 fig = go.Figure()
@@ -1,13 +1,15 @@
-import re
-from collections import defaultdict
 import pandas as pd
 import plotly.graph_objects as go
 import argparse
+from eventcache import load_table, kind_mask
+from binning import bin_index, bin_count, bin_mean, bin_start
+from logparser import SEND, RECV, SINK_NODE
 
 
 # === Configuration ===
 parser = argparse.ArgumentParser(description="Parse COOJA test log.")
 parser.add_argument("input_path", help="Path to the COOJA log file")
+parser.add_argument("--bin", type=float, default=60, help="Bin width in seconds (default: 60)")
 args = parser.parse_args()
 
 logfile = args.input_path
@@ -24,65 +26,40 @@ fixed_colors = {
     'received': 'green'
 }
 
-# === DATA STRUCTURES ===
-queue_q1 = defaultdict(lambda: defaultdict(list))
-queue_q2 = defaultdict(lambda: defaultdict(list))
-recv_per_minute = defaultdict(int)
-total_sent = 0
-total_received = 0
-
 # === PARSE LOG ===
-with open(logfile, 'r') as f:
-    lines = f.readlines()
-
-for line in lines:
-    tick_match = re.match(r'^(\d+)', line)
-    if not tick_match:
-        continue
-    tick = int(tick_match.group(1))
-    minute = tick // 1_000_000 // 60
-
-    # Queue match
-    match = re.match(r'^\d+\s+(\d+)\s+.*?queue\s+(\d+)/\d+\s+(\d+)/\d+', line)
-    if match:
-        node, q1, q2 = match.group(1), int(match.group(2)), int(match.group(3))
-        if node in included_nodes:
-            queue_q1[node][minute].append(q1)
-            queue_q2[node][minute].append(q2)
+table = load_table(logfile)
+bins = bin_index(table['tick'], args.bin)
+node = table['node']
 
-    # Received messages by node 16
-    if re.match(r'^\d+\s+16\s+Data received from .*?\'Msg ', line):
-        recv_per_minute[minute] += 1
-        total_received += 1
+queues = (table['tick'] >= 0) & (table['q2'] >= 0)
+recvs = kind_mask(table, RECV) & (node == int(SINK_NODE)) & (table['seq'] >= 0)
+total_sent = int((kind_mask(table, SEND) & (table['seq'] >= 0)).sum())
+total_received = int(recvs.sum())
 
-    # Sent messages
-    if "Sending message: 'Msg " in line:
-        total_sent += 1
+# Received messages by node 16
+recv_per_minute = bin_count(bins[recvs])
 
 # === PLOT ===
 fig = go.Figure()
 
 # Queue traces
-for node in sorted(included_nodes):
-    if node in queue_q1:
-        q1_minutes = sorted(queue_q1[node].keys())
-        q1_avg = [sum(queue_q1[node][m])/len(queue_q1[node][m]) for m in q1_minutes]
-        fig.add_trace(go.Scatter(x=q1_minutes, y=q1_avg,
-        
-                                 mode="lines+markers", name=f"Q{node}",
-                                 line=dict(color=fixed_colors[node], dash="solid"), yaxis="y1"))
-    if node in queue_q2:
-        q2_minutes = sorted(queue_q2[node].keys())
-        q2_avg = [sum(queue_q2[node][m])/len(queue_q2[node][m]) for m in q2_minutes]
-        #fig.add_trace(go.Scatter(x=q2_minutes, y=q2_avg,
-        #                         mode="lines+markers", name=f"{node} Q2",
-        #                         line=dict(color=fixed_colors[node], dash="dot"), yaxis="y1"))
+for name in sorted(included_nodes):
+    rows = queues & (node == int(name))
+    if rows.any():
+        q1_avg = bin_mean(bins[rows], table['q1'][rows])
+        fig.add_trace(go.Scatter(x=bin_start(q1_avg.index, args.bin), y=q1_avg,
+                                 mode="lines+markers", name=f"Q{name}",
+                                 line=dict(color=fixed_colors[name], dash="solid"), yaxis="y1"))
+        #q2_avg = bin_mean(bins[rows], table['q2'][rows])
+        #fig.add_trace(go.Scatter(x=bin_start(q2_avg.index, args.bin), y=q2_avg,
+        #                         mode="lines+markers", name=f"{name} Q2",
+        #                         line=dict(color=fixed_colors[name], dash="dot"), yaxis="y1"))
 
 # Received trace
 recv_df = pd.DataFrame({
-    "Minute": list(recv_per_minute.keys()),
-    "Received": list(recv_per_minute.values())
-}).sort_values("Minute")
+    "Minute": bin_start(recv_per_minute.index, args.bin),
+    "Received": recv_per_minute.values
+})
 fig.add_trace(go.Scatter(x=recv_df["Minute"], y=recv_df["Received"],
                          mode="lines+markers", name="Msg.Received",
                          line=dict(color=fixed_colors["received"], width=3), yaxis="y2"))
@@ -1,18 +1,19 @@
 import re
+from logparser import iter_node_lines
 
 logfile = "code/analyses/logfiles/TSCH_20_1.testlog"  # ← replace with your actual filename
 send_times = []
 
 node = 6  # Node ID to analyze
 
-with open(logfile, 'r') as file:
-    for line in file:
-        match = re.match(fr'^(\d+)\s+{node}\s+Sending message: \'(.+?)\' to .*', line)
-        if match:
-            tick = int(match.group(1))
-            message = match.group(2)
-            time_in_seconds = tick / 1_000_000
-            send_times.append((time_in_seconds, message))
+# Only the lines of this node are read, from its shard (<log>.nodes.npz)
+for lineno, line in iter_node_lines(logfile, [node]):
+    match = re.match(fr'^(\d+)\s+{node}\s+Sending message: \'(.+?)\' to .*', line)
+    if match:
+        tick = int(match.group(1))
+        message = match.group(2)
+        time_in_seconds = tick / 1_000_000
+        send_times.append((time_in_seconds, message))
 
 # Calculate and print intervals
 print("Node 10 sending messages and time between them:\n")
@@ -0,0 +1,223 @@
+import os
+import argparse
+from array import array
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from logparser import (iter_log_events, parse_line, cache_path, cache_is_current, is_log_file, log_compression,
+                       log_window, index_log, Event, KINDS, PARSER_VERSION)
+
+# === Columnar event cache ===
+# Parsing the .testlog text is the expensive part of every analysis. ingest()
+# does it once and stores the events as integer columns in <log>.events.npz
+# next to the log; logparser.iter_events() reads that file instead of the
+# text whenever it is newer than the log and was written by the current
+# PARSER_VERSION. Missing fields are stored as -1.
+
+COLUMNS = ['lineno', 'tick', 'node', 'event_type', 'sender', 'seq', 'value', 'q1', 'q2', 'length']
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+CHUNK_ROWS = 1 << 16
+MIN_RANGE_BYTES = 1 << 22  # don't start a worker for less than 4 MiB of log
+
+
+def new_columns():
+    return {name: array('q' if name == 'tick' else 'i') for name in COLUMNS}
+
+
+def to_numpy(name, column):
+    return np.frombuffer(column, dtype=np.int64 if name == 'tick' else np.int32)
+
+
+def append_event(columns, event):
+    columns['lineno'].append(event.lineno)
+    columns['tick'].append(-1 if event.tick is None else event.tick)
+    columns['node'].append(int(event.node) if event.node and event.node.isdigit() else -1)
+    columns['event_type'].append(KIND_CODES[event.kind])
+    for name in ('sender', 'seq', 'value', 'q1', 'q2', 'length'):
+        value = getattr(event, name)
+        columns[name].append(-1 if value is None else value)
+
+
+# === Parallel parsing of one log ===
+# A log is cut into byte ranges that start at a line boundary; each worker
+# parses the lines of its range with line numbers counted from the range
+# start. The merge shifts them by the line count of the ranges before, so
+# the table is the same as a sequential parse. Matching sends to receives
+# and the 10-line TSCH confirmation window only use these global line
+# numbers and run on the merged events, so messages that cross a range
+# boundary are counted exactly as before.
+
+def split_ranges(path, parts):
+    """Cut a file into at most `parts` (start, end) byte ranges aligned to line starts."""
+    size = os.path.getsize(path)
+    bounds = [0]
+    with open(path, 'rb') as file:
+        for i in range(1, parts):
+            file.seek(max(size * i // parts - 1, bounds[-1]))
+            file.readline()
+            bounds.append(max(file.tell(), bounds[-1]))
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:]) if end > start]
+
+
+def parse_range(path, start, end):
+    """Parse the lines starting in [start, end) into event columns; returns (columns, line count)."""
+    columns = new_columns()
+    lineno = 0
+    with open(path, 'rb') as file:
+        file.seek(start)
+        position = start
+        for line in file:
+            if position >= end:
+                break
+            position += len(line)
+            event = parse_line(line.decode(), lineno)
+            if event is not None:
+                append_event(columns, event)
+            lineno += 1
+    return columns, lineno
+
+
+def parse_parallel(path, jobs):
+    """Parse a log in `jobs` worker processes and merge the event columns in file order."""
+    ranges = split_ranges(path, min(jobs, max(1, os.path.getsize(path) // MIN_RANGE_BYTES)))
+    if len(ranges) < 2:
+        columns = parse_range(path, 0, os.path.getsize(path))[0]
+        return {name: to_numpy(name, column) for name, column in columns.items()}
+
+    with ProcessPoolExecutor(max_workers=len(ranges)) as pool:
+        results = list(pool.map(parse_range, [path] * len(ranges), *zip(*ranges)))
+
+    first_line = 0
+    for part, line_count in results:
+        part['lineno'] = to_numpy('lineno', part['lineno']) + np.int32(first_line)
+        first_line += line_count
+    return {name: np.concatenate([to_numpy(name, part[name]) for part, _ in results]) for name in COLUMNS}
+
+
+def parse_columns(path, jobs=1):
+    """Parse a COOJA log into event columns (NumPy arrays), using `jobs` processes for a plain log."""
+    if jobs > 1 and not log_compression(path):
+        return parse_parallel(path, jobs)
+    columns = new_columns()
+    for event in iter_log_events(path, window=False):
+        append_event(columns, event)
+    return {name: to_numpy(name, column) for name, column in columns.items()}
+
+
+def write_table(path, columns, shards=False):
+    """Write the event table of a log and its minute index next to it, and its node shards if shards=True."""
+    output = cache_path(path)
+    tmp_output = output + '.tmp'
+    try:
+        with open(tmp_output, 'wb') as file:
+            np.savez(file, parser_version=PARSER_VERSION, **columns)
+        os.replace(tmp_output, output)
+    finally:
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+
+    timestamped = columns['tick'] >= 0
+    index_log(path, columns['lineno'][timestamped], columns['tick'][timestamped],
+              columns['node'][timestamped] if shards else None)
+    return output
+
+
+def ingest(path, jobs=1, shards=False):
+    """Parse a COOJA log once and write its event table next to it, using `jobs` processes."""
+    return write_table(path, parse_columns(path, jobs), shards)
+
+
+def load_table(path, jobs=1, window=True):
+    """Return the event table of a log as a dict of NumPy arrays, ingesting it first if needed.
+
+    If the table can't be written (read-only or shared results directory) the
+    parsed columns are used without caching them. Only the rows of the stored
+    window of the log are returned, unless window=False.
+    """
+    if cache_is_current(path):
+        with np.load(cache_path(path)) as table:
+            table = {name: table[name] for name in COLUMNS}
+    else:
+        table = parse_columns(path, jobs)
+        try:
+            write_table(path, table)
+        except OSError as error:
+            print(f"Not caching the events of {path}: {error}")
+    bounds = log_window(path) if window else None
+    if bounds is not None:
+        rows = (table['lineno'] >= bounds[0]) & (table['lineno'] < bounds[1])
+        table = {name: column[rows] for name, column in table.items()}
+    return table
+
+
+# === Table queries ===
+# Vectorised counterparts of the per-event bookkeeping in the analysers,
+# for scripts that work on the table columns directly (see binning.py).
+
+def kind_mask(table, *kinds):
+    """Boolean mask of the rows of the given kinds that have a tick."""
+    return np.isin(table['event_type'], [KIND_CODES[kind] for kind in kinds]) & (table['tick'] >= 0)
+
+
+def message_key(table):
+    """One int64 per row for the decoded (sender, seq) message pair; rows without one share a key."""
+    return table['sender'].astype(np.int64) * (1 << 32) + table['seq'] + 1
+
+
+def last_match(keys, linenos, query_keys, query_linenos):
+    """Index of the last row with the same key on an earlier line, per query row; -1 if none.
+
+    This is what a dict updated in file order (key -> latest row) returns
+    at each query line, e.g. the send tick of a received message.
+    """
+    if len(keys) == 0:
+        return np.full(len(query_keys), -1)
+    ranks = np.unique(np.concatenate([keys, query_keys]), return_inverse=True)[1].astype(np.int64)
+    span = int(max(linenos.max(initial=0), query_linenos.max(initial=0))) + 1
+    row_ranks, query_ranks = ranks[:len(keys)], ranks[len(keys):]
+    composite = row_ranks * span + linenos
+    order = np.argsort(composite, kind='stable')
+    position = np.searchsorted(composite[order], query_ranks * span + query_linenos) - 1
+    found = order[np.maximum(position, 0)]
+    return np.where((position >= 0) & (row_ranks[found] == query_ranks), found, -1)
+
+
+def iter_cached_events(path, kinds=None, jobs=1):
+    """Yield the Events of a log from its event table, optionally only the given kinds."""
+    table = load_table(path, jobs)
+    if kinds is not None:
+        mask = np.isin(table['event_type'], [KIND_CODES[kind] for kind in kinds])
+        table = {name: column[mask] for name, column in table.items()}
+
+    node_names = {}
+    for start in range(0, len(table['lineno']), CHUNK_ROWS):
+        rows = [table[name][start:start + CHUNK_ROWS].tolist() for name in COLUMNS]
+        for lineno, tick, node, kind, sender, seq, value, q1, q2, length in zip(*rows):
+            if node not in node_names:
+                node_names[node] = None if node < 0 else str(node)
+            yield Event(KINDS[kind], lineno,
+                        None if tick < 0 else tick,
+                        node_names[node],
+                        None if sender < 0 else sender,
+                        None if seq < 0 else seq,
+                        None if value < 0 else value,
+                        None if q1 < 0 else q1,
+                        None if q2 < 0 else q2,
+                        None if length < 0 else length)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Convert COOJA logs into columnar event tables (<log>.events.npz).")
+    parser.add_argument("paths", nargs='+', help="COOJA log files or directories with .testlog[.gz|.zst] files")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes that parse each log (default: 1)")
+    parser.add_argument("--shards", action="store_true",
+                        help="Also write the per-node line shards (<log>.nodes.npz) for node-focused tools")
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if os.path.isdir(path):
+            logs = [os.path.join(path, f) for f in sorted(os.listdir(path)) if is_log_file(f)]
+        else:
+            logs = [path]
+        for log in logs:
+            print(f"Ingested {log} -> {ingest(log, args.jobs, args.shards)}")
@@ -1,26 +1,41 @@
 import argparse
 import re
-import os
+from logparser import open_log, open_log_range, minute_offsets, set_log_window
 
 # === CLI Arguments ===
+# Without --output the window is stored next to the log (<log>.minutes.json)
+# and every analyser reading it through logparser only sees those minutes;
+# the log itself stays untouched. --clear removes the stored window.
 parser = argparse.ArgumentParser(description="Keep only lines between minute A and B (inclusive).")
-parser.add_argument("--input", "-i", required=True, help="Input .testlog file")
-parser.add_argument("--output", "-o", required=True, help="Filtered output file")
-parser.add_argument("--start-minute", "-s", type=int, required=True, help="Start minute (inclusive)")
-parser.add_argument("--end-minute", "-e", type=int, required=True, help="End minute (inclusive)")
+parser.add_argument("--input", "-i", required=True, help="Input .testlog[.gz|.zst] file")
+parser.add_argument("--output", "-o", help="Write the window to this file instead (.gz/.zst suffix compresses it)")
+parser.add_argument("--start-minute", "-s", type=int, help="Start minute (inclusive)")
+parser.add_argument("--end-minute", "-e", type=int, help="End minute (inclusive)")
+parser.add_argument("--clear", action="store_true", help="Remove the stored window of the input")
 args = parser.parse_args()
 
+if args.clear:
+    set_log_window(args.input)
+    print(f"Removed the stored window of {args.input}.")
+    raise SystemExit
+
+if args.start_minute is None or args.end_minute is None:
+    parser.error("--start-minute and --end-minute are required")
+
 start_tick = args.start_minute * 60_000_000
 end_tick = (args.end_minute + 1) * 60_000_000  # include end minute fully
 
-with open(args.input, 'r') as infile, open(args.output, 'w') as outfile:
-    for line in infile:
-        match = re.match(r'^(\d+)', line)
-        if match:
-            tick = int(match.group(1))
-            if start_tick <= tick < end_tick:
-                outfile.write(line)
-
-os.remove(args.input)
-os.rename(args.output, args.input)
-print(f"Filtered log file saved as {args.input}.")
\ No newline at end of file
+if args.output:
+    # Seek straight to the first minute and only read the bytes of the window
+    start, end = minute_offsets(args.input, args.start_minute, args.end_minute)
+    with open_log_range(args.input, start, end) as infile, open_log(args.output, 'wt') as outfile:
+        for line in infile:
+            match = re.match(r'^(\d+)', line)
+            if match:
+                tick = int(match.group(1))
+                if start_tick <= tick < end_tick:
+                    outfile.write(line)
+    print(f"Filtered log file saved as {args.output}.")
+else:
+    window = set_log_window(args.input, start_tick, end_tick)
+    print(f"Stored window of {args.input}: lines {window['first_line']}-{window['end_line'] - 1}.")
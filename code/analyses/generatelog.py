@@ -0,0 +1,178 @@
+import heapq
+import random
+import argparse
+from logparser import open_log, SENDER_NODES, SINK_NODE, MESSAGES_PER_NODE
+
+# === Synthetic COOJA logs ===
+# Writes a .testlog in the formats the analysers match, without Cooja:
+# RPL formation (rank, preferred parent, DIO), 'Sending message', TSCH
+# 'send packet to ... queue a/64 b/64' and "! can't send packet" when the
+# queue is full, 'packet queue length N', CSMA 'not for us', 'Data received
+# from ... in N hops' at node 16, 'All messages send' and the final TEST OK.
+# Lines come out in tick order from a heap of per-node timers and in-flight
+# messages, so the memory use depends on the node count, not on the length
+# of the log.
+
+ROOT_NODE = 1
+QUEUE_SIZE = 64
+TICKS = 1_000_000  # ticks per second
+
+
+def ip_address(node):
+    return f"fd00::{0x200 + node:x}:{node:x}:{node:x}:{node:x}"
+
+
+def link_address(node):
+    return '.'.join([f"{node:04x}"] * 4)
+
+
+def module(level, name, text):
+    return f"[{level:4}: {name:<10}] {text}"
+
+
+class LogGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.random = random.Random(args.seed)
+        self.timers = []  # (tick, order, action, node, data)
+        self.order = 0
+        self.sink = int(SINK_NODE)
+        if args.nodes == 28:
+            self.senders = [int(node) for node in SENDER_NODES]
+        else:
+            self.senders = [node for node in range(2, args.nodes + 1) if node != self.sink]
+        self.sent = dict.fromkeys(self.senders, 0)
+        self.queues = {node: [0, 0] for node in self.senders}
+        self.in_flight = 0
+        self.end_tick = int((args.start + args.duration) * TICKS) if args.duration else None
+
+    def schedule(self, tick, action, node, data=None):
+        self.order += 1
+        heapq.heappush(self.timers, (tick, self.order, action, node, data))
+
+    def interval(self):
+        """Send interval with the +-50 % jitter of sender-node.c."""
+        return int(self.args.interval * TICKS * self.random.uniform(0.5, 1.5))
+
+    def lines(self):
+        args = self.args
+        for node in range(1, args.nodes + 1):
+            self.schedule(self.random.randint(10_000, 5 * TICKS), 'boot', node)
+        for node in self.senders:
+            self.schedule(int(args.start * TICKS) + self.random.randint(0, self.interval()), 'send', node)
+        if args.noise > 0:
+            for node in range(1, args.nodes + 1):
+                self.schedule(int(self.random.expovariate(args.noise) * TICKS), 'noise', node)
+
+        yield "Starting COOJA logger\n"
+        senders_left = len(self.senders)
+        while self.timers and (senders_left or self.in_flight):
+            tick, _, action, node, data = heapq.heappop(self.timers)
+            if self.end_tick is not None and tick >= self.end_tick:
+                return  # hard cap reached, the run did not finish: no TEST OK
+            for text in getattr(self, action)(tick, node, data):
+                yield f"{tick} {node} {text}\n"
+            if action == 'done':
+                senders_left -= 1
+        yield "TEST OK\n"
+
+    # === Node actions (each yields the messages it logs) ===
+    def boot(self, tick, node, data):
+        yield module('DBG', 'RPL', f"RPL: MOP 0 OCP 1 rank {256 + self.random.randint(0, 30) if node != ROOT_NODE else 128}")
+        if node != ROOT_NODE:
+            yield module('DBG', 'RPL', f"RPL: nbr    {ip_address(ROOT_NODE).replace('fd00', 'fe80')}   256,   128 =>   384 --  1 r b a f p")
+        yield module('INFO', 'RPL', "Sending a multicast-DIO with rank 434")
+
+    def send(self, tick, node, data):
+        seq = self.sent[node]
+        self.sent[node] += 1
+        message = f"Msg {ip_address(node)} {seq}"
+        yield f"Sending message: '{message}' to {ip_address(self.sink)}"
+
+        delivered = self.random.random() >= self.args.loss
+        if self.args.mac == 'tsch':
+            queue = self.queues[node]
+            queue[0] = max(0, min(QUEUE_SIZE, queue[0] + self.random.randint(-3, 4)))
+            queue[1] = max(0, min(QUEUE_SIZE, queue[1] + self.random.randint(-3, 3)))
+            if queue[0] >= QUEUE_SIZE:
+                delivered = False
+                yield module('ERR', 'TSCH', f"! can't send packet to {link_address(self.sink)} with seqno {seq % 256}, "
+                                            f"queue {queue[0]}/{QUEUE_SIZE} {queue[1]}/{QUEUE_SIZE}")
+                queue[0] = QUEUE_SIZE // 2
+            else:
+                yield module('INFO', 'TSCH', f"send packet to {link_address(ROOT_NODE)} with seqno {seq % 256}, "
+                                             f"queue {queue[0]}/{QUEUE_SIZE} {queue[1]}/{QUEUE_SIZE}, len 21 38")
+
+        if delivered:
+            hops = self.random.randint(1, self.args.max_hops)
+            latency = hops * 10_000 + int(self.random.expovariate(1 / self.args.latency) * TICKS)
+            self.schedule(tick + latency, 'recv', self.sink, (node, message, hops))
+            self.in_flight += 1
+        if self.sent[node] < self.args.messages:
+            self.schedule(tick + self.interval(), 'send', node)
+        else:
+            self.schedule(tick + self.interval(), 'done', node)
+
+    def recv(self, tick, node, data):
+        sender, message, hops = data
+        self.in_flight -= 1
+        yield (f"Data received from {ip_address(sender)} on port 1234 from port 1234 in {hops} hops "
+               f"with datalength {len(message) + 1}: '{message}'")
+
+    def done(self, tick, node, data):
+        yield "All messages send"  # as printed by code/sender-node.c
+
+    def noise(self, tick, node, data):
+        choice = self.random.random()
+        if choice < 0.25:
+            yield module('DBG', self.args.mac.upper(), f"packet queue length {self.random.randint(0, 10)}")
+        elif choice < 0.4:
+            if self.args.mac == 'csma':
+                yield module('WARN', 'CSMA', "not for us")
+            else:
+                yield module('DBG', 'TSCH', f"packet queue length {self.random.randint(0, 10)}")
+        elif choice < 0.7:
+            yield module('DBG', 'MAC', "received packet, seqno and len are fine")
+        elif choice < 0.85:
+            yield module('INFO', 'RPL', "DIO Timer interval doubled")
+        elif choice < 0.95:
+            yield module('INFO', 'RPL', "Sending a multicast-DIO with rank 434")
+        else:
+            yield module('INFO', 'RPL', "Multicast DIS => reset DIO timer")
+        self.schedule(tick + max(1, int(self.random.expovariate(self.args.noise) * TICKS)), 'noise', node)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Write a synthetic COOJA log to test and benchmark the analysers.")
+    parser.add_argument("output", help="Output .testlog file (.gz/.zst suffix compresses it)")
+    parser.add_argument("--nodes", type=int, default=28, help="Number of nodes, ids 1..N; 1 is the RPL root, 16 the sink (default: 28)")
+    parser.add_argument("--mac", choices=('tsch', 'csma'), default='tsch', help="MAC-specific lines to write (default: tsch)")
+    parser.add_argument("--interval", type=float, default=10, help="Send interval in seconds, jittered +-50 %% (default: 10)")
+    parser.add_argument("--messages", type=int, default=MESSAGES_PER_NODE,
+                        help=f"Messages per sender (default: {MESSAGES_PER_NODE})")
+    parser.add_argument("--loss", type=float, default=0.05, help="Probability that a message never arrives (default: 0.05)")
+    parser.add_argument("--latency", type=float, default=1.0, help="Mean end-to-end latency in seconds (default: 1.0)")
+    parser.add_argument("--max-hops", type=int, default=6, help="Most hops to the sink (default: 6)")
+    parser.add_argument("--noise", type=float, default=0.5,
+                        help="Other debug lines per node per second (default: 0.5)")
+    parser.add_argument("--start", type=float, default=600, help="Second at which the senders start (default: 600)")
+    parser.add_argument("--duration", type=float,
+                        help="Stop this many seconds after --start, without TEST OK (default: when all messages are in)")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed (default: 1)")
+    args = parser.parse_args()
+
+    if args.nodes < int(SINK_NODE):
+        parser.error(f"--nodes must include the sink, node {SINK_NODE}")
+
+    line_count = 0
+    with open_log(args.output, 'wt') as file:
+        batch = []
+        for line in LogGenerator(args).lines():
+            batch.append(line)
+            if len(batch) >= 10_000:
+                file.writelines(batch)
+                line_count += len(batch)
+                batch = []
+        file.writelines(batch)
+        line_count += len(batch)
+    print(f"Wrote {line_count} lines to {args.output}")
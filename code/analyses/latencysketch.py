@@ -0,0 +1,138 @@
+import os
+import re
+import json
+import argparse
+from collections import defaultdict
+
+# === Mergeable latency sketches ===
+# Medians and tail percentiles used to need every delay of a run in a list.
+# A LatencySketch is an HDR-style log-linear histogram of the delays in
+# ticks (µs): values below 2^PRECISION_BITS get their own bucket, larger
+# ones share a bucket with values that differ by less than 1/2^(bits-1),
+# so a quantile is off by at most ~0.006 % with the default. Count, sum, min
+# and max are exact. Sketches of nodes, runs and batches merge by adding
+# bucket counts, and serialise to JSON so a sweep can be pooled later
+# without its raw samples.
+
+PRECISION_BITS = 14
+QUANTILES = (50, 90, 99)
+
+
+class LatencySketch:
+    def __init__(self, bits=PRECISION_BITS):
+        self.bits = bits
+        self.buckets = defaultdict(int)  # bucket index -> count
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def bucket(self, value):
+        shift = max(value.bit_length() - self.bits, 0)
+        return (shift << (self.bits - 1)) + (value >> shift) if shift else value
+
+    def bounds(self, index):
+        """Lowest and highest value that fall in a bucket."""
+        if index < (1 << self.bits):
+            return index, index
+        shift, mantissa = divmod(index - (1 << self.bits), 1 << (self.bits - 1))
+        shift += 1
+        mantissa += 1 << (self.bits - 1)
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def add(self, value, count=1):
+        self.buckets[self.bucket(value)] += count
+        self.count += count
+        self.total += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if other.bits != self.bits:
+            raise ValueError(f"Can't merge sketches of {other.bits} and {self.bits} bits")
+        for index, count in other.buckets.items():
+            self.buckets[index] += count
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+        return self
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def quantile(self, p):
+        """Value at or below which p % of the samples fall (nearest rank)."""
+        if not self.count:
+            return 0
+        rank = max(1, -(-p * self.count // 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                low, high = self.bounds(index)
+                return min(max((low + high) / 2, self.min), self.max)
+        return self.max
+
+    def to_dict(self):
+        return {'bits': self.bits, 'count': self.count, 'total': self.total, 'min': self.min, 'max': self.max,
+                'buckets': sorted(self.buckets.items())}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['bits'])
+        sketch.buckets.update((index, count) for index, count in data['buckets'])
+        sketch.count, sketch.total, sketch.min, sketch.max = data['count'], data['total'], data['min'], data['max']
+        return sketch
+
+
+def merged(sketches):
+    total = LatencySketch()
+    for sketch in sketches:
+        total.merge(sketch)
+    return total
+
+
+def load_sketches(path):
+    """{log file: {'run': LatencySketch, 'nodes': {node: LatencySketch}}} from a sketch file."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        data = json.load(file)
+    return {name: {'run': LatencySketch.from_dict(entry['run']),
+                   'nodes': {node: LatencySketch.from_dict(sketch) for node, sketch in entry['nodes'].items()}}
+            for name, entry in data.items()}
+
+
+def save_sketches(path, sketches):
+    """Write {log file: {'run': dict, 'nodes': {node: dict}}}, sketches in their to_dict() form."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(sketches, file)
+    os.replace(tmp_path, path)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pool the latency sketches of a sweep per send rate (and node).")
+    parser.add_argument("sketch_file", help="Sketch file written by TSCHCreateCSV_Median.py or TSCHCreateCSVWithMedian.py")
+    parser.add_argument("--nodes", action="store_true", help="Also print every sender node per rate")
+    args = parser.parse_args()
+
+    groups = defaultdict(list)
+    for name, entry in load_sketches(args.sketch_file).items():
+        match = re.match(r'(\w+?)_(\d+)_', name)
+        groups[(match.group(1), int(match.group(2))) if match else (name, 0)].append(entry)
+
+    print("Group      | Runs | Node  | Samples | Mean (ms) | p50 (ms)  | p90 (ms)  | p99 (ms)  | Max (ms)")
+    print("-----------|------|-------|---------|-----------|-----------|-----------|-----------|----------")
+    for (mac, rate), entries in sorted(groups.items()):
+        rows = [('ALL', merged(entry['run'] for entry in entries))]
+        if args.nodes:
+            nodes = sorted({node for entry in entries for node in entry['nodes']}, key=int)
+            rows += [(node, merged(entry['nodes'][node] for entry in entries if node in entry['nodes']))
+                     for node in nodes]
+        for node, sketch in rows:
+            percentiles = ' | '.join(f"{sketch.quantile(p) / 1000:9.2f}" for p in QUANTILES)
+            print(f"{mac + '_' + str(rate):10} | {len(entries):4} | {node:5} | {sketch.count:7} | "
+                  f"{sketch.mean() / 1000:9.2f} | {percentiles} | {(sketch.max or 0) / 1000:9.2f}")
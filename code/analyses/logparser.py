@@ -0,0 +1,749 @@
+import io
+import os
+import re
+import gzip
+import json
+import mmap
+import shutil
+from collections import namedtuple
+import numpy as np
+
+# === Shared COOJA log parser ===
+# Every analyser used to run its own set of re.match calls on each line.
+# This module reads a .testlog once, splits off tick and node id with a
+# plain str.split and only runs a (precompiled) regex on the lines whose
+# keyword says it is worth it.
+
+# Bump when parsing changes, so cached summaries get rebuilt
+PARSER_VERSION = 1
+
+SINK_NODE = '16'
+SINK_ADDRESS = 'fd00::210:10:10:10'
+SENDER_NODES = [str(n) for n in [10, 11, 19, 2, 20, 21, 22, 23, 24, 25, 26, 27, 28, 3, 4, 5, 6, 7, 8, 9]]
+MESSAGES_PER_NODE = 100  # sender-node.c stops after 'Msg <ip> 99'
+
+# === Event kinds ===
+SEND = 'send'                        # Sending message: '<msg>' to <addr>
+RECV = 'recv'                        # Data received from ... in N hops ...: '<msg>'
+TSCH_SEND = 'tsch_send'              # [INFO: TSCH ] send packet to <lladdr> ... queue a/64 b/64
+QUEUE_FULL = 'queue_full'            # [... ] ! can't send packet ... queue a/64 b/64
+NOT_FOR_US = 'not_for_us'            # [WARN: CSMA ] not for us
+ALL_SENT = 'all_sent'                # All messages send
+DIO = 'dio'                          # Sending a multicast-DIO
+DAO = 'dao'                          # Sending a DAO
+TRICKLE_DOUBLED = 'trickle_doubled'  # DIO Timer interval doubled
+TRICKLE_RESET = 'trickle_reset'      # Multicast DIS => reset DIO timer
+RANK = 'rank'                        # [DBG : RPL ] RPL: MOP x OCP y rank r
+PARENT = 'parent'                    # [DBG : RPL ] RPL: nbr ... -- 1
+LOG = 'log'                          # any other [LEVEL: MODULE] line
+OTHER = 'other'                      # any other timestamped line
+TEST_OK = 'test_ok'                  # TEST OK written by the Cooja script
+
+# Fixed order, the event cache stores a kind as its index in this tuple
+KINDS = (SEND, RECV, TSCH_SEND, QUEUE_FULL, NOT_FOR_US, ALL_SENT, DIO, DAO,
+         TRICKLE_DOUBLED, TRICKLE_RESET, RANK, PARENT, LOG, OTHER, TEST_OK)
+
+# Kinds that come from a "[LEVEL: MODULE ]" log line
+MODULE_KINDS = frozenset([TSCH_SEND, QUEUE_FULL, NOT_FOR_US, DIO, DAO,
+                          TRICKLE_DOUBLED, TRICKLE_RESET, RANK, PARENT, LOG])
+
+# kind:   one of the kinds above
+# lineno: 0-based line number in the file
+# tick:   simulation time in microseconds
+# node:   node id as it appears in the log (str)
+# sender: node id from the payload 'Msg <ip> <seq>' (send/recv),
+#         destination node id of the link-layer address (tsch_send)
+# seq:    message number from the payload (send/recv)
+# value:  hops (recv) or rank (rank)
+# q1, q2: queue fill from "queue a/64 b/64", q1 only for "queue length N"
+# length: payload length in bytes (send/recv)
+# Fields that don't apply to an event are None.
+Event = namedtuple('Event', ['kind', 'lineno', 'tick', 'node', 'sender', 'seq', 'value', 'q1', 'q2', 'length'])
+
+SEND_PREFIX = "Sending message: '"
+RECV_PREFIX = 'Data received from '
+
+RECV_RE = re.compile(r".*? in (\d+) hops with datalength \d+: '(.+)'")
+RECV_NO_HOPS_RE = re.compile(r".*?: '(.+)'")
+QUEUE_RE = re.compile(r'queue\s+(\d+)/\d+\s+(\d+)/\d+')
+QUEUE_LENGTH_RE = re.compile(r'queue length (\d+)')
+RANK_RE = re.compile(r'RPL: MOP \d+ OCP \d+ rank (\d+)')
+PARENT_RE = re.compile(r'RPL: nbr .*--\s+1')
+
+
+def decode_message(message):
+    """Split a 'Msg fd00::20a:a:a:a 5' payload into (sender node, seq)."""
+    parts = message.split()
+    if len(parts) != 3 or parts[0] != 'Msg' or not parts[2].isdigit():
+        return None, None
+    return address_node(parts[1].rsplit(':', 1)[-1]), int(parts[2])
+
+
+def address_node(group):
+    """Node id from the last IPv6 / first link-layer address group, 0 if unknown."""
+    try:
+        return int(group, 16)
+    except ValueError:
+        return 0  # 'Msg unknown 5'
+
+
+def message_event(kind, lineno, tick, node, message, hops):
+    message = message.strip()
+    sender, seq = decode_message(message)
+    return Event(kind, lineno, tick, node, sender, seq, hops, None, None, len(message))
+
+
+def parse_line(line, lineno=0):
+    """Parse one log line into an Event, or None for lines without a tick."""
+    parts = line.split(None, 2)
+    if len(parts) < 3 or not parts[0].isdigit():
+        if line.strip() == 'TEST OK':
+            return Event(TEST_OK, lineno, None, None, None, None, None, None, None, None)
+        return None
+    tick, node, msg = int(parts[0]), parts[1], parts[2]
+
+    if msg[0] == '[':
+        end = msg.find(']')
+        if end < 0:
+            return Event(OTHER, lineno, tick, node, None, None, None, None, None, None)
+        tag = msg[1:end]
+        body = msg[end + 1:].strip()
+        kind = LOG
+        sender = value = None
+
+        if body.startswith('send packet to ') and tag.rstrip() == 'INFO: TSCH':
+            kind = TSCH_SEND
+            sender = address_node(body[15:].split(None, 1)[0].split('.', 1)[0])
+        elif body.startswith("! can't send packet"):
+            kind = QUEUE_FULL
+        elif body.startswith('not for us') and tag.rstrip() == 'WARN: CSMA':
+            kind = NOT_FOR_US
+        elif body.startswith('RPL: '):
+            match = RANK_RE.match(body)
+            if match:
+                kind = RANK
+                value = int(match.group(1))
+            elif PARENT_RE.match(body):
+                kind = PARENT
+        elif 'multicast-DIO' in body:
+            kind = DIO
+        elif 'Sending a DAO' in body:
+            kind = DAO
+        elif 'DIO Timer interval doubled' in body:
+            kind = TRICKLE_DOUBLED
+        elif 'Multicast DIS => reset DIO timer' in body:
+            kind = TRICKLE_RESET
+
+        q1 = q2 = None
+        if 'queue' in body:
+            match = QUEUE_RE.search(body)
+            if match:
+                q1, q2 = int(match.group(1)), int(match.group(2))
+            else:
+                match = QUEUE_LENGTH_RE.search(body)
+                if match:
+                    q1 = int(match.group(1))
+        if kind == QUEUE_FULL and q1 is None:
+            kind = LOG
+        return Event(kind, lineno, tick, node, sender, None, value, q1, q2, None)
+
+    if msg.startswith(SEND_PREFIX):
+        end = msg.rfind("' to ")
+        if end >= 0:
+            return message_event(SEND, lineno, tick, node, msg[len(SEND_PREFIX):end], None)
+
+    elif msg.startswith(RECV_PREFIX):
+        rest = msg[len(RECV_PREFIX):]
+        match = RECV_RE.match(rest)
+        if match:
+            return message_event(RECV, lineno, tick, node, match.group(2), int(match.group(1)))
+        match = RECV_NO_HOPS_RE.match(rest)
+        if match:
+            return message_event(RECV, lineno, tick, node, match.group(1), None)
+
+    elif msg.startswith('All messages send'):
+        return Event(ALL_SENT, lineno, tick, node, None, None, None, None, None, None)
+
+    elif 'queue length' in msg:
+        match = QUEUE_LENGTH_RE.search(msg)
+        if match:
+            return Event(OTHER, lineno, tick, node, None, None, None, int(match.group(1)), None, None)
+    return Event(OTHER, lineno, tick, node, None, None, None, None, None, None)
+
+
+# === Compressed logs ===
+# Logs can be stored as TSCH_20_1.testlog.gz or .testlog.zst; open_log()
+# picks the decompressor from the suffix and streams the text, so every
+# analyser reads them like a plain .testlog. zstd needs the optional
+# `zstandard` package.
+LOG_SUFFIXES = ('.testlog.gz', '.testlog.zst', '.testlog')
+
+
+def is_log_file(path):
+    return path.endswith(LOG_SUFFIXES)
+
+
+def log_stem(path):
+    """Path without the .testlog[.gz|.zst] suffix."""
+    for suffix in LOG_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return os.path.splitext(path)[0]
+
+
+def log_compression(path):
+    if path.endswith('.gz'):
+        return 'gz'
+    if path.endswith('.zst'):
+        return 'zst'
+    return None
+
+
+def open_log(path, mode='rt', compression=None, window=True):
+    """Open a (possibly compressed) log; compression defaults to the one of the suffix.
+
+    Reading only returns the lines of the stored window of the log, if it has one
+    (see set_log_window); window=False reads the whole file.
+    """
+    compression = compression or log_compression(path)
+    if 't' not in mode and 'b' not in mode:
+        mode += 't'
+    if window and mode.startswith('r') and '+' not in mode:
+        bounds = log_window(path)
+        if bounds is not None:
+            return open_log_range(path, bounds[2], bounds[3], mode, compression)
+    if compression == 'gz':
+        return gzip.open(path, mode)
+    if compression == 'zst':
+        import zstandard
+        return zstandard.open(path, mode)
+    return open(path, mode)
+
+
+def compress_log(path, output, compression='gz'):
+    """Stream a plain log into a compressed output file and remove the original."""
+    if not compression:
+        os.replace(path, output)
+        return output
+    tmp_output = output + '.tmp'
+    with open(path, 'rb') as infile, open_log(tmp_output, 'wb', compression) as outfile:
+        shutil.copyfileobj(infile, outfile, 1 << 20)
+    os.replace(tmp_output, output)
+    os.remove(path)
+    return output
+
+
+def open_log_range(path, start, end, mode='rt', compression=None):
+    """Open only the bytes [start, end) of a (possibly compressed) log, e.g. a range from minute_offsets()."""
+    stream = io.BufferedReader(LogRange(open_log(path, 'rb', compression, window=False), start, end))
+    return stream if 'b' in mode else io.TextIOWrapper(stream)
+
+
+class LogRange(io.RawIOBase):
+    """Read-only view of the bytes [start, end) of a binary file object."""
+
+    def __init__(self, file, start, end):
+        file.seek(start)
+        self.file = file
+        self.remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.file.read(min(len(buffer), self.remaining))
+        buffer[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self.file.close()
+        super().close()
+
+
+# === Minute index and stored windows ===
+# <log>.minutes.json maps every simulated minute to the line number and
+# byte offset (in the decompressed text) of its first line, so a tick
+# window is read by seeking to it instead of scanning the log. It also
+# holds the trim window of a log: open_log(), iter_events() and
+# eventcache.load_table() only return the lines inside it and the log
+# itself is never rewritten. ingest() writes the index from the event
+# table, build_log_index() from the text.
+TICKS_PER_MINUTE = 60_000_000
+
+
+def index_path(path):
+    return log_stem(path) + '.minutes.json'
+
+
+def read_minute_index(path):
+    try:
+        with open(index_path(path)) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return None
+
+
+def load_minute_index(path):
+    """The minute index of a log, or None when it is missing or older than the log."""
+    if not os.path.exists(index_path(path)) or os.path.getmtime(index_path(path)) < os.path.getmtime(path):
+        return None
+    return read_minute_index(path)
+
+
+def scan_line_offsets(path, linenos):
+    """Byte offsets of the given (sorted) line numbers, and the line count and size of the log."""
+    linenos = np.asarray(linenos, dtype=np.int64)
+    offsets = np.zeros(len(linenos), dtype=np.int64)
+    done = lines = size = 0
+    last = b'\n'
+    with open_log(path, 'rb', window=False) as file:
+        while True:
+            chunk = file.read(1 << 22)
+            if not chunk:
+                break
+            newlines = np.flatnonzero(np.frombuffer(chunk, dtype=np.uint8) == ord('\n'))
+            found = np.searchsorted(linenos, lines + len(newlines), side='right')
+            targets = linenos[done:found]  # lines that start after a newline of this chunk
+            offsets[done:found] = np.where(targets == 0, 0, size + newlines[np.maximum(targets - 1 - lines, 0)] + 1)
+            done = found
+            lines += len(newlines)
+            size += len(chunk)
+            last = chunk[-1:]
+    return offsets, lines + (last != b'\n'), size
+
+
+def tick_position(path, index, tick):
+    """(line number, byte offset) of the first line with a tick >= `tick`; None is the end of the log."""
+    minute = tick // TICKS_PER_MINUTE if tick is not None else len(index['lines'])
+    if minute >= len(index['lines']):
+        return index['line_count'], index['size']
+    lineno, offset = index['lines'][max(minute, 0)], index['offsets'][max(minute, 0)]
+    with open_log(path, 'rb', window=False) as file:
+        file.seek(offset)
+        for line in file:
+            parts = line.split(None, 1)
+            if parts and parts[0].isdigit() and int(parts[0]) >= tick:
+                break
+            lineno += 1
+            offset += len(line)
+    return lineno, offset
+
+
+def resolve_window(path, index, start_tick, end_tick):
+    first_line, start_offset = tick_position(path, index, start_tick) if start_tick is not None else (0, 0)
+    end_line, end_offset = tick_position(path, index, end_tick)
+    return {'start_tick': start_tick, 'end_tick': end_tick, 'first_line': first_line, 'end_line': end_line,
+            'start_offset': start_offset, 'end_offset': max(end_offset, start_offset)}
+
+
+def write_minute_index(path, linenos, ticks, scan):
+    """Write the minute index of a log from its timestamped lines and scan_line_offsets() of them."""
+    offsets, line_count, size = scan
+    rows = np.zeros(0, dtype=np.int64)
+    if len(ticks):
+        minutes = np.maximum.accumulate(np.asarray(ticks, dtype=np.int64) // TICKS_PER_MINUTE)
+        rows = np.searchsorted(minutes, np.arange(minutes[-1] + 1))
+    index = {'lines': np.asarray(linenos, dtype=np.int64)[rows].tolist(), 'offsets': offsets[rows].tolist(),
+             'line_count': int(line_count), 'size': size, 'window': None}
+
+    window = (read_minute_index(path) or {}).get('window')
+    if window:  # the log changed, find the stored window again
+        index['window'] = resolve_window(path, index, window['start_tick'], window['end_tick'])
+    save_minute_index(path, index)
+    return index
+
+
+def save_minute_index(path, index):
+    tmp_path = index_path(path) + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(index, file)
+    os.replace(tmp_path, index_path(path))
+
+
+def index_log(path, linenos, ticks, nodes=None):
+    """Write the minute index of a log from its timestamped lines, and its node shards if `nodes` is given, in one scan."""
+    scan = scan_line_offsets(path, linenos)
+    if nodes is not None:
+        write_node_shards(path, linenos, nodes, scan[0])
+    return write_minute_index(path, linenos, ticks, scan)
+
+
+def build_log_index(path, shards=False):
+    """index_log() with the ticks (and node ids for shards=True) read from the text of the log."""
+    linenos, ticks, nodes = [], [], []
+    with open_log(path, 'rb', window=False) as file:
+        for lineno, line in enumerate(file):
+            parts = line.split(None, 2)
+            if parts and parts[0].isdigit():
+                linenos.append(lineno)
+                ticks.append(int(parts[0]))
+                nodes.append(int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else -1)
+    return index_log(path, linenos, ticks, nodes if shards else None)
+
+
+def set_log_window(path, start_tick=None, end_tick=None):
+    """Store the tick window [start_tick, end_tick) of a log; both None removes it."""
+    index = load_minute_index(path) or build_log_index(path)
+    index['window'] = None
+    if start_tick is not None or end_tick is not None:
+        index['window'] = resolve_window(path, index, start_tick, end_tick)
+    save_minute_index(path, index)
+    return index['window']
+
+
+def log_window(path):
+    """(first line, end line, start offset, end offset) of the stored window of a log, or None."""
+    index = read_minute_index(path)
+    if not index or not index['window']:
+        return None
+    if os.path.getmtime(index_path(path)) < os.path.getmtime(path):
+        index = build_log_index(path)
+    window = index['window']
+    return window['first_line'], window['end_line'], window['start_offset'], window['end_offset']
+
+
+def minute_offsets(path, start_minute, end_minute):
+    """Byte range [start, end) of the minutes start_minute..end_minute (inclusive) of a log."""
+    index = load_minute_index(path) or build_log_index(path)
+    start = tick_position(path, index, start_minute * TICKS_PER_MINUTE)[1]
+    return start, max(tick_position(path, index, (end_minute + 1) * TICKS_PER_MINUTE)[1], start)
+
+
+# === Per-node shards ===
+# <log>.nodes.npz lists the line numbers and byte offsets of every node's
+# lines, grouped by node id. Tools that look at one or a few nodes (send
+# jitter of node 6, the queues of 3/6/25/26) read just those lines instead
+# of matching every line of the interleaved log. Shards are optional: they
+# are built the first time iter_node_lines() needs them, or up front by
+# `eventcache.py --shards`, in the offset scan of the minute index, so they
+# only cost the offsets, not a copy of the log.
+
+def shard_path(path):
+    return log_stem(path) + '.nodes.npz'
+
+
+def write_node_shards(path, linenos, nodes, offsets):
+    nodes = np.asarray(nodes, dtype=np.int64)
+    rows = np.flatnonzero(nodes >= 0)
+    rows = rows[np.argsort(nodes[rows], kind='stable')]
+    ids, starts = np.unique(nodes[rows], return_index=True)
+    tmp_path = shard_path(path) + '.tmp'
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, ids=ids, starts=np.append(starts, len(rows)),
+                 lineno=np.asarray(linenos, dtype=np.int64)[rows], offset=np.asarray(offsets)[rows])
+    os.replace(tmp_path, shard_path(path))
+
+
+def load_node_shards(path):
+    if not os.path.exists(shard_path(path)) or os.path.getmtime(shard_path(path)) < os.path.getmtime(path):
+        build_log_index(path, shards=True)
+    with np.load(shard_path(path)) as shards:
+        return {name: shards[name] for name in ('ids', 'starts', 'lineno', 'offset')}
+
+
+def iter_node_lines(path, nodes):
+    """Yield (line number, line) of the lines logged by the given node ids, in file order.
+
+    Without shards that can be written (read-only results directory) the text is filtered instead.
+    """
+    try:
+        shards = load_node_shards(path)
+    except OSError:
+        yield from filter_node_lines(path, nodes)
+        return
+    linenos, offsets = [], []
+    for node in nodes:
+        i = np.searchsorted(shards['ids'], int(node))
+        if i < len(shards['ids']) and shards['ids'][i] == int(node):
+            linenos.append(shards['lineno'][shards['starts'][i]:shards['starts'][i + 1]])
+            offsets.append(shards['offset'][shards['starts'][i]:shards['starts'][i + 1]])
+    if not linenos:
+        return
+    linenos, offsets = np.concatenate(linenos), np.concatenate(offsets)
+    order = np.argsort(linenos, kind='stable')
+    linenos, offsets = linenos[order], offsets[order]
+    bounds = log_window(path)
+    if bounds is not None:
+        rows = (linenos >= bounds[0]) & (linenos < bounds[1])
+        linenos, offsets = linenos[rows], offsets[rows]
+
+    with open_log(path, 'rb', window=False) as file:
+        if log_compression(path):  # no random access, seek forward through the stream
+            for lineno, offset in zip(linenos.tolist(), offsets.tolist()):
+                file.seek(offset)
+                yield lineno, file.readline().decode()
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            for lineno, offset in zip(linenos.tolist(), offsets.tolist()):
+                end = data.find(b'\n', offset)
+                yield lineno, data[offset:len(data) if end < 0 else end + 1].decode()
+
+
+def filter_node_lines(path, nodes):
+    """iter_node_lines() by reading every line of the log."""
+    prefixes = {str(int(node)) for node in nodes}
+    bounds = log_window(path)
+    with open_log(path) as file:
+        for lineno, line in enumerate(file, start=bounds[0] if bounds else 0):
+            parts = line.split(None, 2)
+            if len(parts) > 1 and parts[0].isdigit() and parts[1] in prefixes:
+                yield lineno, line
+
+
+def iter_log_events(path, kinds=None, window=True):
+    """Parse the text of a COOJA log once and yield its Events, optionally only the given kinds."""
+    bounds = log_window(path) if window else None
+    with open_log(path, window=window) as file:
+        for lineno, line in enumerate(file, start=bounds[0] if bounds else 0):
+            event = parse_line(line, lineno)
+            if event is not None and (kinds is None or event.kind in kinds):
+                yield event
+
+
+# === Bytes-level scan ===
+# Most analysers only need sends, receives and TSCH queue events. For those
+# kinds the log is mmapped and searched as bytes for the fixed keyword of
+# each kind; only the lines that contain one are decoded and parsed, every
+# other line stays in the page cache untouched. Line numbers come from the
+# positions of the newlines, so the Events equal those of iter_log_events.
+KEYWORDS = {
+    SEND: SEND_PREFIX.encode(),
+    RECV: RECV_PREFIX.encode(),
+    TSCH_SEND: b'send packet to ',
+    QUEUE_FULL: b"! can't send packet",
+    NOT_FOR_US: b'not for us',
+}
+
+
+SCAN_CHUNK = 1 << 22
+
+
+def iter_mmap_events(path, kinds):
+    """Yield the Events of the given kinds (all in KEYWORDS) by scanning the mmapped log."""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            bounds = log_window(path)
+            low, high = (bounds[2], bounds[3]) if bounds else (0, len(data))
+            starts = set()
+            for kind in kinds:
+                keyword = KEYWORDS[kind]
+                position = data.find(keyword, low, high)
+                while position >= 0:
+                    starts.add(data.rfind(b'\n', 0, position) + 1)
+                    end = data.find(b'\n', position)
+                    position = data.find(keyword, end, high) if end >= 0 else -1
+
+            # Line numbers are counted forward from one match to the next, a
+            # bounded chunk at a time, so memory does not grow with the log
+            lineno, counted = (bounds[0], low) if bounds else (0, 0)
+            for start in sorted(starts):
+                while counted < start:
+                    step = min(start, counted + SCAN_CHUNK)
+                    lineno += data[counted:step].count(b'\n')
+                    counted = step
+                end = data.find(b'\n', start)
+                event = parse_line(data[start:len(data) if end < 0 else end + 1].decode(), lineno)
+                if event is not None and event.kind in kinds:
+                    yield event
+
+
+class LogFollower:
+    """Parse a log that is still being written, a few appended lines at a time.
+
+    poll() reads from the offset where the previous call stopped and returns
+    the Events of the complete lines; a trailing partial line is kept until
+    its newline arrives. When the file shrinks or is replaced (new inode,
+    e.g. the next batch started) the follower starts over at offset 0 and
+    poll() reports that, so callers can drop what they aggregated.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.identity = None
+        self.reset()
+
+    def reset(self):
+        self.offset = 0
+        self.lineno = 0
+        self.partial = b''
+
+    def poll(self):
+        """Return (events, restarted) for the lines appended since the last poll."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return [], False
+        identity = (stat.st_dev, stat.st_ino)
+        restarted = self.identity is not None and (identity != self.identity or stat.st_size < self.offset)
+        if restarted:
+            self.reset()
+        self.identity = identity
+        if stat.st_size == self.offset:
+            return [], restarted
+
+        with open(self.path, 'rb') as file:
+            file.seek(self.offset)
+            data = file.read()
+        self.offset += len(data)
+        lines = (self.partial + data).split(b'\n')
+        self.partial = lines.pop()
+
+        events = []
+        for line in lines:
+            event = parse_line(line.decode() + '\n', self.lineno)
+            if event is not None:
+                events.append(event)
+            self.lineno += 1
+        return events, restarted
+
+    def flush(self):
+        """Return the Events still to read once the writer is done, including a last line without newline."""
+        events, _ = self.poll()
+        if self.partial:
+            event = parse_line(self.partial.decode() + '\n', self.lineno)
+            if event is not None:
+                events.append(event)
+            self.lineno += 1
+            self.partial = b''
+        return events
+
+
+def iter_events(path, kinds=None, jobs=1):
+    """Like iter_log_events, but read the columnar event cache instead when it is up to date.
+
+    With jobs > 1 a missing or stale cache is first rebuilt by parsing the log in parallel.
+    Without a cache, kinds that have a fixed keyword are found with the bytes-level scan
+    (plain logs only, a compressed log is streamed through open_log).
+    """
+    if jobs > 1 or cache_is_current(path):
+        from eventcache import iter_cached_events
+        yield from iter_cached_events(path, kinds, jobs)
+    elif kinds is not None and all(kind in KEYWORDS for kind in kinds) and not log_compression(path):
+        yield from iter_mmap_events(path, kinds)
+    else:
+        yield from iter_log_events(path, kinds)
+
+
+def cache_path(path):
+    return log_stem(path) + '.events.npz'
+
+
+def cache_is_current(path):
+    """True if the event table of a log is newer than the log and written by this PARSER_VERSION."""
+    output = cache_path(path)
+    if not os.path.exists(output) or os.path.getmtime(output) < os.path.getmtime(path):
+        return False
+    try:
+        with np.load(output) as table:
+            return 'parser_version' in table.files and int(table['parser_version']) == PARSER_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+class NetworkFormation:
+    """Tracks which nodes joined the DODAG, one Event at a time.
+
+    A node is ready once it logged an RPL rank and, unless it is the root,
+    a preferred parent. feed() bumps a counter when a node first becomes
+    ready, so an event costs the same for 20 or 500 nodes, and returns True
+    from the event that completes the network on (built_tick is then set).
+    Readers can stop there; runners and live tools can poll `complete`.
+    """
+
+    def __init__(self, expected_nodes, root_node='1'):
+        self.expected_nodes = set(expected_nodes)
+        self.root_node = root_node
+        self.has_rank = set()
+        self.has_parent = set()
+        self.ready = set()
+        self.first_tick = {}
+        self.built_tick = None
+
+    @property
+    def complete(self):
+        return self.built_tick is not None
+
+    def feed(self, event):
+        node = event.node
+        if event.kind not in (RANK, PARENT) or node not in self.expected_nodes:
+            return self.complete
+        (self.has_rank if event.kind == RANK else self.has_parent).add(node)
+        self.first_tick[node] = min(self.first_tick.get(node, event.tick), event.tick)
+
+        if node not in self.ready and node in self.has_rank and (node == self.root_node or node in self.has_parent):
+            self.ready.add(node)
+            if len(self.ready) == len(self.expected_nodes) and self.built_tick is None:
+                self.built_tick = event.tick
+        return self.complete
+
+
+class PendingSends:
+    """Per-node state machine for the TSCH "Confirmed" metric.
+
+    A 'Sending message' counts as confirmed when the same node logs
+    '[INFO: TSCH ] send packet to' within the next `window` lines.
+    """
+
+    def __init__(self, window=10):
+        self.window = window
+        self.pending = {}  # node -> line numbers of sends still waiting
+
+    def add(self, event):
+        # Sends more than `window` lines back can't be confirmed by any later line
+        waiting = self.pending.setdefault(event.node, [])
+        oldest = event.lineno - self.window
+        stale = 0
+        while stale < len(waiting) and waiting[stale] < oldest:
+            stale += 1
+        del waiting[:stale]
+        waiting.append(event.lineno)
+
+    def confirm(self, event):
+        """Feed a TSCH_SEND event, return how many of that node's sends it confirms."""
+        waiting = self.pending.pop(event.node, None)
+        if not waiting:
+            return 0
+        oldest = event.lineno - self.window
+        return sum(1 for lineno in waiting if lineno >= oldest)
+
+
+class SentMessages:
+    """Send tick and sending node of each message, indexed by [payload sender, seq].
+
+    Replaces a dict keyed by the payload: a message is the integer pair
+    decoded from 'Msg <ip> <seq>', both arrays are preallocated for
+    MESSAGES_PER_NODE messages per node and grow only if a log goes past
+    that. A later send of the same pair overwrites the earlier one, like
+    the dict did. Sends without a decodable payload are not stored.
+    """
+
+    def __init__(self, nodes=len(SENDER_NODES) + 9, messages=MESSAGES_PER_NODE):
+        self.ticks = np.full((nodes, messages), -1, dtype=np.int64)
+        self.nodes = np.zeros((nodes, messages), dtype=np.int32)
+
+    def add(self, event):
+        sender, seq = event.sender, event.seq
+        if seq is None:
+            return
+        if sender >= self.ticks.shape[0] or seq >= self.ticks.shape[1]:
+            self.grow(sender + 1, seq + 1)
+        self.ticks[sender, seq] = event.tick
+        self.nodes[sender, seq] = int(event.node)
+
+    def lookup(self, event):
+        """Return (send tick, sending node) of the message in a RECV event, or None."""
+        sender, seq = event.sender, event.seq
+        if seq is None or sender >= self.ticks.shape[0] or seq >= self.ticks.shape[1]:
+            return None
+        tick = self.ticks.item(sender, seq)
+        if tick < 0:
+            return None
+        return tick, str(self.nodes.item(sender, seq))
+
+    def grow(self, nodes, messages):
+        pad = ((0, max(nodes - self.ticks.shape[0], 0)), (0, max(messages - self.ticks.shape[1], 0)))
+        self.ticks = np.pad(self.ticks, pad, constant_values=-1)
+        self.nodes = np.pad(self.nodes, pad)
@@ -0,0 +1,172 @@
+import os
+import csv
+import argparse
+import numpy as np
+from logparser import iter_events, is_log_file
+
+# === Time-weighted queue occupancy ===
+# A queue sample ("queue 3/64 0/64" or "queue length 3") is the fill level
+# until the node logs the next one, so every queue is a step function of
+# simulation time. The per-minute mean of the samples weights a level by
+# how often the node happened to log while it held; here a level is
+# weighted by how long it held, which makes runs that log at different
+# rates (CSMA vs TSCH) comparable. Each queue only keeps its last sample
+# and the time spent at each fill level, enough for the time-weighted
+# mean, any percentile and the time above any threshold.
+
+QUEUE_SIZE = 64
+QUEUES = ('Q1', 'Q2', 'Length')  # "queue a/64 b/64" -> Q1, Q2; "queue length N" -> Length
+
+
+class QueueLevels:
+    """Time (in ticks) spent at each fill level of one queue; mergeable across nodes and runs."""
+
+    def __init__(self, capacity=QUEUE_SIZE):
+        self.time = np.zeros(capacity + 1, dtype=np.int64)
+        self.level = None
+        self.last_tick = None
+        self.max = 0
+
+    def sample(self, tick, level):
+        self.advance(tick)
+        if level >= len(self.time):
+            self.time = np.pad(self.time, (0, level + 1 - len(self.time)))
+        self.level = level
+        self.max = max(self.max, level)
+
+    def advance(self, tick):
+        """Hold the current level until `tick`."""
+        if self.level is not None and tick > self.last_tick:
+            self.time[self.level] += tick - self.last_tick
+        self.last_tick = tick if self.last_tick is None else max(self.last_tick, tick)
+
+    def merge(self, other):
+        if len(other.time) > len(self.time):
+            self.time = np.pad(self.time, (0, len(other.time) - len(self.time)))
+        self.time[:len(other.time)] += other.time
+        self.max = max(self.max, other.max)
+
+    def duration(self):
+        return int(self.time.sum())
+
+    def mean(self):
+        duration = self.duration()
+        return float(np.arange(len(self.time)) @ self.time) / duration if duration else 0
+
+    def percentile(self, p):
+        """Lowest level the queue was at or below for p % of the time."""
+        duration = self.duration()
+        if not duration:
+            return 0
+        return int(np.searchsorted(np.cumsum(self.time), max(p / 100 * duration, 1)))
+
+    def time_above(self, threshold):
+        """Fraction of the time the fill was above `threshold`."""
+        duration = self.duration()
+        return int(self.time[threshold + 1:].sum()) / duration if duration else 0
+
+
+class QueueOccupancy:
+    """Step functions of all queues in a log, fed one Event at a time."""
+
+    def __init__(self):
+        self.queues = {}  # (node, queue) -> QueueLevels
+        self.end = None
+
+    def feed(self, event):
+        if event.tick is None:
+            return
+        self.end = event.tick if self.end is None else max(self.end, event.tick)
+        if event.q1 is None:
+            return
+        if event.q2 is not None:
+            self.queue(event.node, 'Q1').sample(event.tick, event.q1)
+            self.queue(event.node, 'Q2').sample(event.tick, event.q2)
+        else:
+            self.queue(event.node, 'Length').sample(event.tick, event.q1)
+
+    def queue(self, node, name):
+        if (node, name) not in self.queues:
+            self.queues[(node, name)] = QueueLevels()
+        return self.queues[(node, name)]
+
+    def close(self, tick=None):
+        """Hold every queue's last level until `tick` (default: the last tick of the log)."""
+        tick = self.end if tick is None else tick
+        if tick is not None:
+            for levels in self.queues.values():
+                levels.advance(tick)
+
+    def network(self, name):
+        """All nodes' time at each level of one queue, merged."""
+        total = QueueLevels()
+        for (node, queue), levels in self.queues.items():
+            if queue == name:
+                total.merge(levels)
+        return total
+
+
+def occupancy_row(logfile, node, queue, levels, threshold):
+    return {
+        'logfile': os.path.basename(logfile),
+        'node': node,
+        'queue': queue,
+        'time_s': round(levels.duration() / 1_000_000, 3),
+        'twa': round(levels.mean(), 3),
+        'p50': levels.percentile(50),
+        'p90': levels.percentile(90),
+        'p99': levels.percentile(99),
+        'max': levels.max,
+        'above_threshold_percent': round(levels.time_above(threshold) * 100, 2)
+    }
+
+
+def summarise_log(logfile, threshold, jobs=1):
+    occupancy = QueueOccupancy()
+    for event in iter_events(logfile, jobs=jobs):
+        occupancy.feed(event)
+    occupancy.close()
+
+    rows = [occupancy_row(logfile, node, queue, occupancy.queues[(node, queue)], threshold)
+            for node, queue in sorted(occupancy.queues, key=lambda key: (QUEUES.index(key[1]), int(key[0])))]
+    rows += [occupancy_row(logfile, 'ALL', queue, occupancy.network(queue), threshold)
+             for queue in QUEUES if any(name == queue for _, name in occupancy.queues)]
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Time-weighted queue occupancy per node from COOJA logs (TSCH and CSMA).")
+    parser.add_argument("paths", nargs='+', help="COOJA log files or directories with .testlog[.gz|.zst] files")
+    parser.add_argument("--threshold", type=int, default=QUEUE_SIZE * 3 // 4,
+                        help=f"Report the time spent above this fill level (default: {QUEUE_SIZE * 3 // 4})")
+    parser.add_argument("--csv", help="Also append the rows to this CSV file")
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes that parse each log (default: 1)")
+    args = parser.parse_args()
+
+    logs = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            logs += [os.path.join(path, f) for f in sorted(os.listdir(path)) if is_log_file(f)]
+        else:
+            logs.append(path)
+
+    fieldnames = ['logfile', 'node', 'queue', 'time_s', 'twa', 'p50', 'p90', 'p99', 'max', 'above_threshold_percent']
+    all_rows = []
+    for logfile in logs:
+        rows = summarise_log(logfile, args.threshold, args.jobs)
+        all_rows += rows
+
+        print(f"\n{logfile}")
+        print(f"Node  | Queue  | Time (s)  | TW avg | p50 | p90 | p99 | Max | > {args.threshold} (%)")
+        print("------|--------|-----------|--------|-----|-----|-----|-----|----------")
+        for row in rows:
+            print(f"{row['node']:5} | {row['queue']:6} | {row['time_s']:9.1f} | {row['twa']:6.2f} | "
+                  f"{row['p50']:3} | {row['p90']:3} | {row['p99']:3} | {row['max']:3} | {row['above_threshold_percent']:8.2f}")
+
+    if args.csv:
+        write_header = not os.path.exists(args.csv)
+        with open(args.csv, mode='a', newline='') as csvfile:
+            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+            if write_header:
+                writer.writeheader()
+            writer.writerows(all_rows)
@@ -1,15 +1,16 @@
-import re
 from collections import defaultdict
 import os
 import csv
 from datetime import datetime
 import glob
+from logparser import (iter_events, is_log_file, PendingSends, SentMessages, MODULE_KINDS, SEND, RECV, TSCH_SEND,
+                       QUEUE_FULL, SENDER_NODES, SINK_NODE)
 
 # === Parameters ===
 timing_prefix = "TSCH_75"
 log_dir = "code/analyses/logfiles"
-pattern = os.path.join(log_dir, f"{timing_prefix}_*.testlog")
-log_files = sorted(glob.glob(pattern))
+pattern = os.path.join(log_dir, f"{timing_prefix}_*.testlog*")
+log_files = sorted(path for path in glob.glob(pattern) if is_log_file(path))
 
 # Ensure output directory exists
 os.makedirs(log_dir, exist_ok=True)
@@ -22,14 +23,15 @@ timestampbatch = datetime.now().strftime('%Y%m%d%H%M%S')
 combined_rows = []
 
 # === Fixed sender nodes ===
-sender_nodes = [str(n) for n in [10, 11, 19, 2, 20, 21, 22, 23, 24, 25, 26, 27, 28, 3, 4, 5, 6, 7, 8, 9]]
+sender_nodes = SENDER_NODES
 
 # === Process each file ===
 for input_path in log_files:
-    sent_messages = {}
+    sent_messages = SentMessages()
     sender_delays = defaultdict(list)
     sent_counts = defaultdict(int)
     confirmed_sent_counts = defaultdict(int)
+    pending_sends = PendingSends()
     recv_counts = defaultdict(int)
     recv_bytes = defaultdict(int)
     first_send_time = defaultdict(lambda: float('inf'))
@@ -39,59 +41,46 @@ for input_path in log_files:
     queue_full_counts = defaultdict(int)
     tsch_send_counts = defaultdict(int)
 
-    with open(input_path, 'r') as file:
-        lines = list(file)
-
-    for i, line in enumerate(lines):
-        if re.match(r'^(\d+)', line):
-            node_match = re.match(r'^\d+\s+(\d+)\s+\[.*?\]', line)
-            if node_match:
-                node = node_match.group(1)
-                if node in sender_nodes:
-                    line_counts[node] += 1
-
-            tsch_match = re.match(r'^\d+\s+(\d+)\s+\[INFO: TSCH\s+\] send packet to .*', line)
-            if tsch_match:
-                node = tsch_match.group(1)
-                if node in sender_nodes:
-                    tsch_send_counts[node] += 1
-
-            send_match = re.match(r'^(\d+)\s+(\d+)\s+Sending message: \'(.+)\' to fd00::210:10:10:10', line)
-            if send_match:
-                time = int(send_match.group(1))
-                sender_node = send_match.group(2)
-                message = send_match.group(3).strip()
+    for event in iter_events(input_path):
+        if event.tick is None:
+            continue
+        node = event.node
+
+        if event.kind in MODULE_KINDS and node in sender_nodes:
+            line_counts[node] += 1
+
+        if event.kind == TSCH_SEND:
+            if node in sender_nodes:
+                tsch_send_counts[node] += 1
+                confirmed_sent_counts[node] += pending_sends.confirm(event)
+
+        elif event.kind == SEND:
+            time = event.tick
+            sender_node = node
+            if sender_node in sender_nodes:
+                sent_counts[sender_node] += 1
+                sent_messages.add(event)
+                first_send_time[sender_node] = min(first_send_time[sender_node], time)
+
+                pending_sends.add(event)
+
+        elif event.kind == RECV and node == SINK_NODE and event.value is not None:
+            time = event.tick
+            hops = event.value
+            sent = sent_messages.lookup(event)
+            if sent:
+                send_time, sender_node = sent
                 if sender_node in sender_nodes:
-                    sent_counts[sender_node] += 1
-                    sent_messages[message] = (time, sender_node)
-                    first_send_time[sender_node] = min(first_send_time[sender_node], time)
-
-                    for followup_line in lines[i+1:i+11]:
-                        tsch_confirm = re.match(r'^\d+\s+' + sender_node + r'\s+\[INFO: TSCH\s+\] send packet to .*', followup_line)
-                        if tsch_confirm:
-                            confirmed_sent_counts[sender_node] += 1
-                            break
-
-            recv_match = re.match(r'^(\d+)\s+16\s+Data received from .*? in (\d+) hops with datalength \d+: \'(.+)\'', line)
-            if recv_match:
-                time = int(recv_match.group(1))
-                hops = int(recv_match.group(2))
-                message = recv_match.group(3).strip()
-                if message in sent_messages:
-                    send_time, sender_node = sent_messages[message]
-                    if sender_node in sender_nodes:
-                        delay = time - send_time
-                        sender_delays[sender_node].append(delay)
-                        sender_hops[sender_node].append(hops)
-                        recv_counts[sender_node] += 1
-                        recv_bytes[sender_node] += len(message)
-                        last_recv_time[sender_node] = max(last_recv_time[sender_node], time)
-
-            queue_match = re.match(r'^\d+\s+(\d+)\s+\[.*?\] ! can\'t send packet .* queue \d+/\d+ \d+/\d+', line)
-            if queue_match:
-                node = queue_match.group(1)
-                if node in sender_nodes:
-                    queue_full_counts[node] += 1
+                    delay = time - send_time
+                    sender_delays[sender_node].append(delay)
+                    sender_hops[sender_node].append(hops)
+                    recv_counts[sender_node] += 1
+                    recv_bytes[sender_node] += event.length
+                    last_recv_time[sender_node] = max(last_recv_time[sender_node], time)
+
+        elif event.kind == QUEUE_FULL:
+            if node in sender_nodes:
+                queue_full_counts[node] += 1
 
     for sender in sorted(sender_nodes):
         sent = sent_counts[sender]
@@ -3,6 +3,7 @@ import pandas as pd
 import plotly.express as px
 from collections import defaultdict
 import argparse
+from logparser import open_log
 
 # === Configuration ===
 parser = argparse.ArgumentParser(description="Parse COOJA test log.")
@@ -17,7 +18,7 @@ sender_nodes = [10, 11, 19, 2, 20, 21, 22, 23, 24, 25, 26, 27, 28, 3, 4, 5, 6, 7
 send_counts = defaultdict(lambda: defaultdict(int))  # node -> minute -> count
 total_per_minute = defaultdict(int)  # minute -> total sends from all nodes
 
-with open(logfile, 'r') as file:
+with open_log(logfile) as file:
     for line in file:
         match = re.match(r'^(\d+)\s+(\d+)\s+Sending message: ', line)
         if match:
@@ -1,59 +1,33 @@
 import plotly.graph_objects as go
 import pandas as pd
-import re
-from collections import defaultdict
+from eventcache import load_table, kind_mask
+from binning import bin_index, bin_count, bin_mean, bin_frame, bin_start
+from logparser import RECV, SINK_NODE
 
 # === Input files ===
 logfiles = [
     f"code/analyses/logfiles/TSCH_50_{i}.testlog" for i in range(1, 5)
 ]
+bin_width = 60  # seconds per point; any width works on the cached event tables
 
 # === Helper function ===
 def parse_log(logfile):
-    queue1_per_minute = defaultdict(list)
-    queue2_per_minute = defaultdict(list)
-    recv_per_minute = defaultdict(int)
-
     try:
-        with open(logfile, 'r') as file:
-            for line in file:
-                # Queue fill parsing
-                match_queue = re.search(r'queue\s+(\d+)/64\s+(\d+)/64', line)
-                if match_queue:
-                    tick_match = re.match(r'^(\d+)', line)
-                    if tick_match:
-                        tick = int(tick_match.group(1))
-                        minute = tick // 1_000_000 // 60
-                        q1 = int(match_queue.group(1))
-                        q2 = int(match_queue.group(2))
-                        queue1_per_minute[minute].append(q1)
-                        queue2_per_minute[minute].append(q2)
-
-                # Message received by Node 16
-                match_recv = re.match(r'^(\d+)\s+16\s+Data received from .*?: \'Msg ', line)
-                if match_recv:
-                    tick = int(match_recv.group(1))
-                    minute = tick // 1_000_000 // 60
-                    recv_per_minute[minute] += 1
+        table = load_table(logfile)
     except FileNotFoundError:
         print(f"⚠️ File not found: {logfile}")
         return pd.DataFrame()
 
-    # Create DataFrame
-    all_minutes = sorted(set(queue1_per_minute.keys()) | set(queue2_per_minute.keys()) | set(recv_per_minute.keys()))
-    records = []
-    for minute in all_minutes:
-        avg_q1 = sum(queue1_per_minute[minute]) / len(queue1_per_minute[minute]) if queue1_per_minute[minute] else 0
-        avg_q2 = sum(queue2_per_minute[minute]) / len(queue2_per_minute[minute]) if queue2_per_minute[minute] else 0
-        received = recv_per_minute.get(minute, 0)
-        records.append({
-            "Minute": minute,
-            "Avg Queue 1": avg_q1,
-            "Avg Queue 2": avg_q2,
-            "Messages Received (Node 16)": received
-        })
+    bins = bin_index(table['tick'], bin_width)
+    queues = (table['tick'] >= 0) & (table['q2'] >= 0)  # queue fill
+    recvs = kind_mask(table, RECV) & (table['node'] == int(SINK_NODE)) & (table['seq'] >= 0)  # 'Msg ...' at node 16
 
-    df = pd.DataFrame(records)
+    df = bin_frame({
+        "Avg Queue 1": bin_mean(bins[queues], table['q1'][queues]),
+        "Avg Queue 2": bin_mean(bins[queues], table['q2'][queues]),
+        "Messages Received (Node 16)": bin_count(bins[recvs])
+    })
+    df.insert(0, "Minute", bin_start(df.index, bin_width))
     return df
 
 # === Plotting ===
@@ -2,26 +2,77 @@
 
 import sys
 import os
-from subprocess import Popen, PIPE, STDOUT, CalledProcessError
+import shutil
+import tempfile
+from collections import defaultdict
 from datetime import datetime
+from eventcache import ingest
+from coojasweep import prepare_workspace, store_build, run_cooja, timed_out, simulation_nodes, formation_report
+from logparser import compress_log, NetworkFormation, SentMessages, SEND, RECV, NOT_FOR_US, SINK_NODE
 
 
-saveLogs = True  # Set to True to save the logs, False to delete them
+class SenderStats:
+    """Per-sender delivery statistics of one run, built one event at a time.
 
-timestampbatch = datetime.now().strftime('%Y%m%d%H%M%S')
+    run_cooja() feeds it the events of the log while Cooja writes it; only
+    running sums are kept, so the memory use does not grow with the run.
+    """
+
+    def __init__(self):
+        # Verzonden berichten: (sender, seq) => (timestamp, sender_node)
+        self.sent_messages = SentMessages()
+
+        # Verzameldata per sender
+        self.delay_sums = defaultdict(int)
+        self.sent_counts = defaultdict(int)
+        self.recv_counts = defaultdict(int)
+        self.recv_bytes = defaultdict(int)
+        self.first_send_time = defaultdict(lambda: float('inf'))
+        self.last_recv_time = defaultdict(lambda: 0)
+        self.hop_sums = defaultdict(int)
+
+        # Extra: "not for us" warnings per node
+        self.not_for_us_counts = defaultdict(int)
+
+    def feed(self, event):
+        # Verstuurd bericht detecteren
+        if event.kind == SEND:
+            time = event.tick
+            sender_node = event.node
+
+            self.sent_messages.add(event)
+            self.sent_counts[sender_node] += 1
+            self.first_send_time[sender_node] = min(self.first_send_time[sender_node], time)
+
+        # Ontvangen bericht detecteren op node 16
+        elif event.kind == RECV and event.node == SINK_NODE and event.value is not None:
+            time = event.tick
+            hops = event.value
+
+            sent = self.sent_messages.lookup(event)
+            if sent:
+                send_time, sender_node = sent
+                delay = time - send_time
 
-# get the path of this example
-SELF_PATH = os.path.dirname(os.path.abspath(__file__))
-# move three levels up
-CONTIKI_PATH = os.path.dirname(os.path.dirname(SELF_PATH))
+                self.delay_sums[sender_node] += delay
+                self.hop_sums[sender_node] += hops
+                self.recv_counts[sender_node] += 1
+                self.recv_bytes[sender_node] += event.length
+                self.last_recv_time[sender_node] = max(self.last_recv_time[sender_node], time)
 
-# COOJA_PATH = os.path.normpath(os.path.join(CONTIKI_PATH, "tools", "cooja"))
-COOJA_PATH = "/home/ubuntu/contiki-ng/tools/cooja"
+        # Detecteer "not for us" waarschuwingen
+        elif event.kind == NOT_FOR_US:
+            self.not_for_us_counts[event.node] += 1
+
+
+saveLogs = True  # Set to True to save the logs, False to delete them
+logCompression = 'gz'  # 'gz', 'zst' (needs zstandard) or None to keep saved logs as plain text
+
+timestampbatch = datetime.now().strftime('%Y%m%d%H%M%S')
 
 cooja_input = '/home/ubuntu/Documents/project2_MPA/2024_2025_Project_MPA/code/analyses/simulation_NEW.csc'
 cooja_output = "code/analyses/COOJA.testlog"
 csv_output = "code/analyses/CSMA_Analysis.csv"
-filename = "code/sender-node.c"
 if (os.path.exists(cooja_output)):
     os.remove(cooja_output) # remove previous Cooja output
 
@@ -38,121 +89,42 @@ for sendNumbers in messageRates:
     # set number of batches per run #  Nu test voor 1 batch.  zet 2 op 31 dan hebben we 30 batches
     for batch in range(1,2):
 
-        search_text = "XXXSEND_INTERVALXXX"
-        replace_text = f'(({sendNumbers} * CLOCK_SECOND))'
-        print (replace_text)
         sendrate = sendNumbers   # 1 message per minute
 
-        logfile = f"code/analyses/logfiles/CSMA_{sendrate}_{batch}.testlog"
+        logfile = f"code/analyses/logfiles/CSMA_{sendrate}_{batch}.testlog" + (f".{logCompression}" if logCompression else "")
 
         print (f"Processing batch {batch} with  sendrate : {sendrate}")
 
-        # Read the file content
-        with open(filename, "r") as file:
-            content = file.read()
-
-        # Replace the text
-        content = content.replace(search_text, replace_text)
-
-        # Write the updated content back to the same file
-        with open(filename, "w") as file:
-            file.write(content)
-
-
-
-        # Read the file content
-        with open("code/analyses/coojalogger.js", "r") as file2:
-            content = file2.read()
-
-        # Replace the text
-        replaceTimout = str(int(15000000*(sendNumbers/60)))
-        print (replaceTimout)
-        content = content.replace('XXXtimeoutXXX', replaceTimout)
-
-        # Write the updated content back to the same file
-        with open("code/analyses/coojalogger.js", "w") as file2:
-            file2.write(content)
+        # The send interval is a compile-time define in a scratch copy of the
+        # firmware, so code/ is never edited (see coojasweep.py)
+        input_file = sys.argv[1] if len(sys.argv) > 1 else cooja_input
+        if not os.access(input_file, os.R_OK):
+            print('Simulation script "{}" does not exist'.format(input_file))
+            exit(-1)
+        run_dir = tempfile.mkdtemp(prefix=f"CSMA_{sendrate}_{batch}_")
+        simulation, firmware = prepare_workspace(run_dir, 'CSMA', sendNumbers, input_file)
+        cooja_output = os.path.join(os.path.dirname(simulation), 'COOJA.testlog')
         #######################################################
-        # Run a child process and get its output
-
-        def run_subprocess(args, input_string):
-            retcode = -1
-            stdoutdata = ''
-            try:
-                proc = Popen(args, stdout=PIPE, stderr=STDOUT, stdin=PIPE, shell=True, universal_newlines=True)
-                (stdoutdata, stderrdata) = proc.communicate(input_string)
-                if not stdoutdata:
-                    stdoutdata = '\n'
-                if stderrdata:
-                    stdoutdata += stderrdata + '\n'
-                retcode = proc.returncode
-            except OSError as e:
-                sys.stderr.write("run_subprocess OSError:" + str(e))
-            except CalledProcessError as e:
-                sys.stderr.write("run_subprocess CalledProcessError:" + str(e))
-                retcode = e.returncode
-            except Exception as e:
-                sys.stderr.write("run_subprocess exception:" + str(e))
-            finally:
-                return (retcode, stdoutdata)
-
-        #############################################################
-        # Run a single instance of Cooja on a given simulation script
-
-        def execute_test(cooja_file):
-            # cleanup
-            try:
-                os.remove(cooja_output)
-            except FileNotFoundError as ex:
-                pass
-            except PermissionError as ex:
-                print("Cannot remove previous Cooja output:", ex)
-                return False
-
-            filename = os.path.join(SELF_PATH, cooja_file)
-            args = " ".join([COOJA_PATH + "/gradlew --no-watch-fs --parallel --build-cache -p", COOJA_PATH, "run --args='--contiki=" + CONTIKI_PATH, "--no-gui", "--logdir=" + SELF_PATH, filename + "'"])
-            sys.stdout.write("  Running Cooja, args={}\n".format(args))
-
-            (retcode, output) = run_subprocess(args, '')
-            if retcode != 0:
-                sys.stderr.write("Failed, retcode=" + str(retcode) + ", output:")
-                sys.stderr.write(output)
-                return False
-
-            sys.stdout.write("  Checking for output...")
-
-            is_done = False
-            with open(cooja_output, "r") as f:
-                for line in f.readlines():
-                    line = line.strip()
-                    if line == "TEST OK":
-                        sys.stdout.write(" done.\n")
-                        is_done = True
-                        continue
-
-            if not is_done:
-                sys.stdout.write("  test failed.\n")
-                return False
-
-            sys.stdout.write(" test done\n")
-            return True
+        # Run Cooja; the statistics below are collected while the log is
+        # written, together with the TEST OK check (see coojasweep.run_cooja)
 
-        #######################################################
-        # Run the application
+        stats = SenderStats()
+        formation = NetworkFormation(simulation_nodes(simulation))
 
         def main():
-            input_file = cooja_input
-            if len(sys.argv) > 1:
-                # change from the default
-                input_file = sys.argv[1]
-
-            if not os.access(input_file, os.R_OK):
-                print('Simulation script "{}" does not exist'.format(input_file))
-                exit(-1)
-
             print('Using simulation script "{}"'.format(input_file))
-            if not execute_test(input_file):
+            sys.stdout.write("  Running Cooja on {}\n".format(simulation))
+            ok, output = run_cooja(simulation, os.path.dirname(cooja_output), consumers=[stats, formation])
+            if not ok:
+                if timed_out(os.path.dirname(cooja_output)):
+                    sys.stderr.write("Failed: the traffic did not drain before the hard cap\n")
+                else:
+                    sys.stderr.write("Failed, output:")
+                    sys.stderr.write(output)
                 exit(-1)
+            sys.stdout.write("  test done\n")
+            sys.stdout.write(f"  {formation_report(formation)}\n")
+            store_build(os.path.join(run_dir, 'code'), firmware)
 
         #######################################################
 
@@ -162,63 +134,6 @@ for sendNumbers in messageRates:
 
         ########################################################
 
-
-        import re
-        from collections import defaultdict
-
-        # Verzonden berichten: message => (timestamp, sender_node)
-        sent_messages = {}
-
-        # Verzameldata per sender
-        sender_delays = defaultdict(list)
-        sent_counts = defaultdict(int)
-        recv_counts = defaultdict(int)
-        recv_bytes = defaultdict(int)
-        first_send_time = defaultdict(lambda: float('inf'))
-        last_recv_time = defaultdict(lambda: 0)
-        sender_hops = defaultdict(list)
-
-        # Extra: "not for us" warnings per node
-        not_for_us_counts = defaultdict(int)
-
-        with open('code/analyses/COOJA.testlog', 'r') as file:
-            for line in file:
-                # Verstuurd bericht detecteren
-                send_match = re.match(r'^(\d+)\s+(\d+)\s+Sending message: \'(.+)\' to fd00::210:10:10:10', line)
-                if send_match:
-                    time = int(send_match.group(1))
-                    sender_node = send_match.group(2)
-                    message = send_match.group(3).strip()
-
-                    sent_messages[message] = (time, sender_node)
-                    sent_counts[sender_node] += 1
-                    first_send_time[sender_node] = min(first_send_time[sender_node], time)
-
-                # Ontvangen bericht detecteren op node 16
-                recv_match = re.match(
-                    r'^(\d+)\s+16\s+Data received from .*? in (\d+) hops with datalength \d+: \'(.+)\'', line)
-                if recv_match:
-                    time = int(recv_match.group(1))
-                    hops = int(recv_match.group(2))
-                    message = recv_match.group(3).strip()
-
-                    #print(f"Received message: {message} | Hops: {hops}")
-
-                    if message in sent_messages:
-                        send_time, sender_node = sent_messages[message]
-                        delay = time - send_time
-
-                        sender_delays[sender_node].append(delay)
-                        sender_hops[sender_node].append(hops)
-                        recv_counts[sender_node] += 1
-                        recv_bytes[sender_node] += len(message)
-                        last_recv_time[sender_node] = max(last_recv_time[sender_node], time)
-
-                # Detecteer "not for us" waarschuwingen
-                not_for_us_match = re.match(r'^\d+\s+(\d+)\s+\[WARN: CSMA\s+\]\s+not for us', line)
-                if not_for_us_match:
-                    node = not_for_us_match.group(1)
-                    not_for_us_counts[node] += 1
         '''
         #why not for us? All nodes on a wireless channel receive all packets, but they must filter out packets that aren’t meant for them.
         This log entry indicates that the MAC layer did its job of filtering.
@@ -260,17 +175,17 @@ for sendNumbers in messageRates:
             if write_header:
                 writer.writeheader()
 
-            all_senders = sorted(set(sent_counts.keys()) and set(recv_counts.keys()) and set(not_for_us_counts.keys()))
+            all_senders = sorted(set(stats.sent_counts.keys()) and set(stats.recv_counts.keys()) and set(stats.not_for_us_counts.keys()))
             for sender in all_senders:
-                sent = sent_counts[sender]
+                sent = stats.sent_counts[sender]
                 if sent > 0:
-                    received = recv_counts.get(sender, 0)
+                    received = stats.recv_counts.get(sender, 0)
                     ratio = (received / sent) * 100 if sent > 0 else 0
-                    avg_delay = sum(sender_delays[sender]) / received if received > 0 else 0
-                    avg_hops = sum(sender_hops[sender]) / received if received > 0 else 0
-                    time_span = (last_recv_time[sender] - first_send_time[sender]) / 1000  # ms → sec
-                    throughput = (recv_bytes[sender] / (time_span / 1000)) if time_span > 0 else 0
-                    not_for_us = not_for_us_counts.get(sender, 0)
+                    avg_delay = stats.delay_sums[sender] / received if received > 0 else 0
+                    avg_hops = stats.hop_sums[sender] / received if received > 0 else 0
+                    time_span = (stats.last_recv_time[sender] - stats.first_send_time[sender]) / 1000  # ms → sec
+                    throughput = (stats.recv_bytes[sender] / (time_span / 1000)) if time_span > 0 else 0
+                    not_for_us = stats.not_for_us_counts.get(sender, 0)
 
                     print(f"{sender:11} | {avg_delay/1000:14.2f} | {sent:4} | {received:8} | {ratio:9.1f}% | {throughput:16.2f} | {not_for_us:11} | {avg_hops:.2f}")
 
@@ -302,33 +217,15 @@ for sendNumbers in messageRates:
 
         # Print mean line
         print("-" * 96)
-        print(f"{'MEAN':11} | {total_delay/num_senders:14.2f} | "
-            f"{total_sent//num_senders:4} | {total_received//num_senders:8} | "
-            f"{total_success/num_senders:9.1f}% | {total_throughput/num_senders:16.2f} | "
-            f"{total_not_for_us//num_senders:11} | {total_avg_hops/num_senders:.2f}")
-
-        if (saveLogs == True):
-            os.rename(cooja_output, logfile)
+        if num_senders:
+            print(f"{'MEAN':11} | {total_delay/num_senders:14.2f} | "
+                f"{total_sent//num_senders:4} | {total_received//num_senders:8} | "
+                f"{total_success/num_senders:9.1f}% | {total_throughput/num_senders:16.2f} | "
+                f"{total_not_for_us//num_senders:11} | {total_avg_hops/num_senders:.2f}")
         else:
-            os.remove(cooja_output)
-        # Read the file content
-        with open(filename, "r") as file:
-            content = file.read()   
-
-        # Replace the text
-        content = content.replace(replace_text,search_text)
-
-        # Write the updated content back to the same file
-        with open(filename, "w") as file:
-            file.write(content)
+            print("No messages were sent in this run")
 
-
-
-        with open("code/analyses/coojalogger.js", "r") as file2:
-            content = file2.read()   
-
-        # Replace the text
-        content = content.replace(replaceTimout,'XXXtimeoutXXX')
-
-        with open("code/analyses/coojalogger.js", "w") as file2:
-            file2.write(content)
+        if (saveLogs == True):
+            compress_log(cooja_output, logfile, logCompression)
+            ingest(logfile)
+        shutil.rmtree(run_dir, ignore_errors=True)
@@ -0,0 +1,113 @@
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from logparser import PARSER_VERSION, log_window
+
+# === Per-log summary cache ===
+# The *CreateCSV scripts rebuild their summary from every log in logfiles/
+# on each run. This cache remembers the summary row of each log, keyed by
+# analyser name and version plus the log's size, mtime and content hash,
+# so only new or changed logs are parsed again.
+# If size and mtime are unchanged the log is trusted without hashing; a log
+# that was only touched (same content, new mtime) is rehashed, not reparsed.
+# A changed stored window (filterByMinute, cleanlogfile) also invalidates it.
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def stored_window(path):
+    window = log_window(path)
+    return list(window) if window else None
+
+
+class SummaryCache:
+    def __init__(self, cache_file, analyser, version):
+        self.cache_file = cache_file
+        self.analyser = analyser
+        self.key = f"{analyser}:{version}:{PARSER_VERSION}"
+        self.entries = {}
+        self.seen = set()
+        self.changed = False
+        try:
+            with open(cache_file, 'r') as file:
+                self.entries = json.load(file)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    def name(self, log_path):
+        return f"{self.key}:{os.path.abspath(log_path)}"
+
+    def cached(self, log_path):
+        """Return the cache entry of a log if its content did not change, else None."""
+        stat = os.stat(log_path)
+        name = self.name(log_path)
+        entry = self.entries.get(name)
+        self.seen.add(name)
+        if not entry or entry['size'] != stat.st_size or entry.get('window') != stored_window(log_path):
+            return None
+        if entry['mtime'] == stat.st_mtime:
+            return entry
+        if entry['sha256'] != file_digest(log_path):
+            return None
+        entry['mtime'] = stat.st_mtime
+        self.changed = True
+        return entry
+
+    def store(self, log_path, row):
+        stat = os.stat(log_path)
+        entry = {'sha256': file_digest(log_path), 'row': row, 'size': stat.st_size, 'mtime': stat.st_mtime,
+                 'window': stored_window(log_path)}
+        self.entries[self.name(log_path)] = entry
+        self.changed = True
+        return entry
+
+    def lookup(self, log_path, summarise):
+        """Return summarise(log_path), from the cache when the log did not change."""
+        entry = self.cached(log_path)
+        if entry is None:
+            entry = self.store(log_path, summarise(log_path))
+        return entry['row']
+
+    def lookup_all(self, log_paths, summarise, jobs=1):
+        """lookup() for a list of logs, the logs that need parsing are summarised by `jobs` processes.
+
+        Rows are returned in the order of log_paths, whatever order the workers finish in.
+        """
+        missing = [path for path in log_paths if self.cached(path) is None]
+        if jobs > 1 and len(missing) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(missing))) as pool:
+                rows = list(pool.map(summarise, missing))
+        else:
+            rows = [summarise(path) for path in missing]
+        for path, row in zip(missing, rows):
+            self.store(path, row)
+        return [self.entries[self.name(path)]['row'] for path in log_paths]
+
+    def save(self, prune=True):
+        """Write the cache, dropping this analyser's entries for old versions and logs that are gone.
+
+        With prune=False, entries this run did not look at are kept, e.g. when only new logs were stored.
+        """
+        stale = [name for name in self.entries
+                 if prune and name.startswith(self.analyser + ':') and name not in self.seen]
+        for name in stale:
+            del self.entries[name]
+        if not self.changed and not stale:
+            return
+        tmp_file = self.cache_file + '.tmp'
+        try:
+            with open(tmp_file, 'w') as file:
+                json.dump(self.entries, file)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as error:
+            # A read-only log directory: the rows are recomputed next time
+            print(f"Not saving the summary cache {self.cache_file}: {error}")
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
@@ -3,6 +3,7 @@ from collections import defaultdict
 import pandas as pd
 import plotly.graph_objects as go
 import argparse
+from logparser import open_log
 
 # === CLI Argument Configuration ===
 parser = argparse.ArgumentParser(description="Parse COOJA log and plot Trickle resets per minute.")
@@ -15,7 +16,7 @@ logfile = args.input_path
 resets_per_minute = defaultdict(int)
 
 # === Parse the log file ===
-with open(logfile, 'r') as file:
+with open_log(logfile) as file:
     for line in file:
         if "Multicast DIS => reset DIO timer" in line:
             tick_match = re.match(r'^(\d+)', line)
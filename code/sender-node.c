@@ -13,7 +13,12 @@
 #define UDP_PORT 1234
 
 //#define SEND_INTERVAL    (60 * CLOCK_SECOND / 10)
+/* Sweeps set the interval at build time: DEFINES=SEND_INTERVAL_SECONDS=<s> */
+#ifdef SEND_INTERVAL_SECONDS
+#define SEND_INTERVAL    ((clock_time_t)(SEND_INTERVAL_SECONDS * CLOCK_SECOND))
+#else
 #define SEND_INTERVAL    ((20 * CLOCK_SECOND))
+#endif
 #define START_DELAY      (CLOCK_SECOND * 600)
 #define JITTER_PERCENT   100
 